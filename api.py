@@ -0,0 +1,315 @@
+"""Versioned JSON API mirroring the read pages: ``/api/v1``.
+
+Every list endpoint takes ``?fields=`` ( comma separated, see the FIELDS
+maps ) and the same keyset pagination arguments as the HTML listings
+( ``after`` / ``before`` / ``limit`` ). Venue and artist lists and
+searches also take ``?genre=`` ( repeatable, all must match ); with
+``?facets=1`` the response carries the genre counts of the whole result
+set ( see genres.py ). ``/venues/near`` lists the venues within ``radius``
+miles of ``city`` / ``state`` or ``lat`` / ``lng`` ( see geo.py ). Only the requested columns are
+selected, rows are never loaded as ORM objects, and the response is
+written with a compact JSON encoder.
+
+``/api/v1/export/<kind>`` streams a whole table like ``flask export``;
+it and ``/api/v1/status`` need ``Authorization: Bearer <EXPORT_TOKEN>``.
+"""
+import hmac
+import json
+import os
+from datetime import date, datetime
+
+from flask import Blueprint, abort, current_app, request, stream_with_context
+from werkzeug.exceptions import HTTPException
+
+from bulk import EXPORT_FORMATS, KINDS, encode_chunks, export_chunks, export_query, parse_since
+from autocomplete import autocomplete
+from budget import query_budget
+from conditional import conditional
+from dbpool import pool_status
+from genres import facet_counts, filter_genres, requested_genres
+from geo import near_args, nearby
+from counts import upcoming_counts
+from models import db, Venue, Artist, Show
+from pagination import keyset_page, page_args
+from search import search, search_facets
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+VENUE_FIELDS = {
+    'id': Venue.id,
+    'name': Venue.name,
+    'genres': Venue.genres,
+    'address': Venue.address,
+    'city': Venue.city,
+    'state': Venue.state,
+    'phone': Venue.phone,
+    'website': Venue.website_link,
+    'facebook_link': Venue.facebook_link,
+    'seeking_talent': Venue.seeking_talent,
+    'seeking_description': Venue.seeking_description,
+    'image_link': Venue.image_link,
+}
+
+ARTIST_FIELDS = {
+    'id': Artist.id,
+    'name': Artist.name,
+    'genres': Artist.genres,
+    'city': Artist.city,
+    'state': Artist.state,
+    'phone': Artist.phone,
+    'website': Artist.website_link,
+    'facebook_link': Artist.facebook_link,
+    'seeking_venue': Artist.seeking_venue,
+    'seeking_description': Artist.seeking_description,
+    'image_link': Artist.image_link,
+}
+
+SHOW_FIELDS = {
+    'id': Show.id,
+    'start_time': Show.start_time,
+    'duration': Show.duration,
+    'venue_id': Show.venue_id,
+    'venue_name': Venue.name,
+    'venue_image_link': Venue.image_link,
+    'artist_id': Show.artist_id,
+    'artist_name': Artist.name,
+    'artist_image_link': Artist.image_link,
+}
+
+# fields that are not columns of the entity itself
+UPCOMING_COUNT = 'num_upcoming_shows'
+SHOW_LISTS = ('past_shows', 'upcoming_shows')
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def jsonify_compact(payload, status=200):
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False, default=_default)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+@api.errorhandler(HTTPException)
+def api_error(error):
+    return jsonify_compact({'error': error.description}, error.code)
+
+
+# the app wide handlers of these codes render HTML and would win over the class handler
+api.register_error_handler(400, api_error)
+api.register_error_handler(404, api_error)
+
+
+def requested_fields(available, default=None):
+    """The ``?fields=`` names, checked against ``available``."""
+    fields = request.args.get('fields')
+    if not fields:
+        return list(default or available)
+    names = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        abort(400, f"Unknown fields: {', '.join(unknown)}")
+    return names
+
+
+def select_fields(fields_map, names, keys=()):
+    """Columns for ``names`` ( labelled ), followed by any key column not among them."""
+    columns = [fields_map[name].label(name) for name in names if name in fields_map]
+    selected = {column.name for column in columns}
+    return columns + [key for key in keys if key.key not in selected]
+
+
+def serialize(rows, names):
+    return [dict(zip(names, row)) for row in rows]
+
+
+def list_response(query, keys, names):
+    page = keyset_page(query, keys, **page_args())
+    return jsonify_compact({
+        'data': serialize(page.items, names),
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'limit': page.limit,
+    })
+
+
+def wants_facets():
+    return request.args.get('facets') == '1'
+
+
+def _entity_list(kind, model, fields_map):
+    available = list(fields_map) + [UPCOMING_COUNT]
+    names = requested_fields(available, default=['id', 'name'])
+    column_names = [name for name in names if name in fields_map]
+    keys = (model.name, model.id)
+    genres = requested_genres()
+    query = filter_genres(db.session.query(*select_fields(fields_map, column_names, keys)), model, genres)
+    page = keyset_page(query, keys, **page_args())
+    data = serialize(page.items, column_names)
+    if UPCOMING_COUNT in names:
+        counts = upcoming_counts.get_many(kind, [row.id for row in page.items])
+        for item, row in zip(data, page.items):
+            item[UPCOMING_COUNT] = counts[row.id]
+    payload = {
+        'data': data,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+        'limit': page.limit,
+    }
+    if wants_facets():
+        payload['facets'] = [facet._asdict() for facet in facet_counts(query, model, genres, db.session)]
+    return jsonify_compact(payload)
+
+
+def _entity_detail(kind, model, id, fields_map, show_fields, show_fk):
+    available = list(fields_map) + [UPCOMING_COUNT] + list(SHOW_LISTS)
+    names = requested_fields(available, default=list(fields_map) + list(SHOW_LISTS))
+    column_names = [name for name in names if name in fields_map]
+    row = db.session.query(*select_fields(fields_map, column_names, (model.id,))
+        ).filter(model.id == id).one_or_none()
+    if row is None:
+        abort(404, f'No {kind} with id {id}')
+    data = dict(zip(column_names, row))
+
+    if UPCOMING_COUNT in names:
+        data[UPCOMING_COUNT] = upcoming_counts.get(kind, id)
+    if any(name in names for name in SHOW_LISTS):
+        shows = db.session.query(*[SHOW_FIELDS[name].label(name) for name in show_fields]
+            ).join(Venue).join(Artist).filter(show_fk == id).order_by(Show.start_time).all()
+        current_time = datetime.now()
+        lists = {'past_shows': [], 'upcoming_shows': []}
+        for show in serialize(shows, show_fields):
+            lists['upcoming_shows' if show['start_time'] > current_time else 'past_shows'].append(show)
+        for name in SHOW_LISTS:
+            if name in names:
+                data[name] = lists[name]
+                data[name.replace('shows', 'shows_count')] = len(lists[name])
+    return jsonify_compact(data)
+
+
+def _entity_search(kind, model):
+    term = request.args.get('q', '')
+    genres = requested_genres()
+    count, results = search(model, term, current_app.config['SEARCH_RESULTS_LIMIT'], genres=genres)
+    counts = upcoming_counts.get_many(kind, [result.id for result in results])
+    payload = {
+        'count': count,
+        'data': [{'id': result.id, 'name': result.name, UPCOMING_COUNT: counts[result.id]}
+                 for result in results],
+    }
+    if wants_facets():
+        payload['facets'] = [facet._asdict() for facet in search_facets(model, term, db.session, genres)]
+    return jsonify_compact(payload)
+
+
+@api.route('/venues')
+@query_budget(4)
+@conditional('Venue', 'Show', timed=True)
+def venues():
+    return _entity_list('venue', Venue, VENUE_FIELDS)
+
+
+@api.route('/venues/search')
+@query_budget(5)
+@conditional('Venue', 'Show', timed=True)
+def search_venues():
+    return _entity_search('venue', Venue)
+
+
+@api.route('/venues/near')
+@query_budget(5)
+@conditional('Venue', 'Show', timed=True)
+def venues_near():
+    latitude, longitude, radius, place = near_args()
+    if latitude is None:
+        abort(404 if place else 400, f'No location known for {place}' if place else 'city / state or lat / lng is required')
+    count, venues = nearby(latitude, longitude, radius, current_app.config['NEAR_RESULTS_LIMIT'])
+    counts = upcoming_counts.get_many('venue', [venue.id for venue in venues])
+    return jsonify_compact({
+        'count': count,
+        'origin': {'lat': latitude, 'lng': longitude},
+        'radius': radius,
+        'data': [dict(venue._asdict(), **{UPCOMING_COUNT: counts[venue.id]}) for venue in venues],
+    })
+
+
+@api.route('/venues/<int:venue_id>')
+@query_budget(4)
+@conditional('Venue', 'Artist', 'Show', timed=True)
+def show_venue(venue_id):
+    return _entity_detail('venue', Venue, venue_id, VENUE_FIELDS,
+                          ('artist_id', 'artist_name', 'artist_image_link', 'start_time'), Show.venue_id)
+
+
+@api.route('/artists')
+@query_budget(4)
+@conditional('Artist', 'Show', timed=True)
+def artists():
+    return _entity_list('artist', Artist, ARTIST_FIELDS)
+
+
+@api.route('/artists/search')
+@query_budget(5)
+@conditional('Artist', 'Show', timed=True)
+def search_artists():
+    return _entity_search('artist', Artist)
+
+
+@api.route('/artists/<int:artist_id>')
+@query_budget(4)
+@conditional('Venue', 'Artist', 'Show', timed=True)
+def show_artist(artist_id):
+    return _entity_detail('artist', Artist, artist_id, ARTIST_FIELDS,
+                          ('venue_id', 'venue_name', 'venue_image_link', 'start_time'), Show.artist_id)
+
+
+@api.route('/shows')
+@query_budget(2)
+@conditional('Show', 'Venue', 'Artist')
+def shows():
+    default = ['venue_id', 'venue_name', 'artist_id', 'artist_name', 'artist_image_link', 'start_time']
+    names = requested_fields(SHOW_FIELDS, default=default)
+    keys = (Show.start_time, Show.id)
+    query = db.session.query(*select_fields(SHOW_FIELDS, names, keys)
+        ).select_from(Show).join(Venue).join(Artist)
+    return list_response(query, keys, names)
+
+
+def require_token():
+    token = current_app.config.get('EXPORT_TOKEN')
+    supplied = request.headers.get('Authorization', '')
+    if not token or not hmac.compare_digest(supplied.encode(), f'Bearer {token}'.encode()):
+        abort(401, 'a valid export token is required')
+
+
+@api.route('/status')
+@query_budget(0)
+def status():
+    """Pool use, replica health and autocomplete index size of the worker answering the request."""
+    require_token()
+    replicas = current_app.extensions.get('replicas')
+    return jsonify_compact({'pid': os.getpid(), 'pool': pool_status(),
+                            'replicas': replicas.status() if replicas else [],
+                            'autocomplete': autocomplete.stats()})
+
+
+@api.route('/export/<kind>')
+@query_budget(1)
+def export(kind):
+    require_token()
+    if kind not in KINDS:
+        abort(404)
+    format = request.args.get('format', 'csv')
+    if format not in EXPORT_FORMATS:
+        abort(400, f"format must be one of {', '.join(sorted(EXPORT_FORMATS))}")
+    try:
+        query = export_query(kind, parse_since(request.args.get('since')), request.args.get('names') == '1')
+    except (ValueError, OverflowError) as e:
+        abort(400, f'since: {e}')
+    chunks = export_chunks(query, current_app.config.get('EXPORT_CHUNK_SIZE', 5000))
+    response = current_app.response_class(
+        stream_with_context(encode_chunks(chunks, format)), mimetype=EXPORT_FORMATS[format])
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{format}'
+    return response
@@ -5,15 +5,36 @@
 import json
 from operator import ne
 import dateutil.parser
-import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+from babel import Locale
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, stream_with_context
 from flask_moment import Moment
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
-from models import db, Venue, Artist, Show   
+from sqlalchemy.orm import contains_eager
+from models import db, Venue, Artist, Show, DEFAULT_SHOW_DURATION
+from search import search, search_facets
+from genres import facet_counts, filter_genres, genre_facets, requested_genres
+from geo import near_args, nearby
+from bookings import BookingConflict, check_booking, conflicts, is_exclusion_violation
+from sqlalchemy.exc import IntegrityError
+from pagination import keyset_page, page_args, wants_stream, StreamedPage
+from explain import explain_queries_command
+from bulk import import_command, export_command
+from cache import detail_cache
+from counts import upcoming_counts
+from conditional import conditional
+from budget import query_budget
+import assets
+import dbpool
+import replicas
+import instrument
+import metrics
+from api import api
+from autocomplete import autocomplete
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -22,28 +43,83 @@ app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
 db.init_app(app)
+dbpool.init_app(app)
+replicas.init_app(app)
+instrument.init_app(app)
+metrics.init_app(app)
 migrate = Migrate(app, db)
+app.cli.add_command(explain_queries_command)
+app.cli.add_command(import_command)
+app.cli.add_command(export_command)
+detail_cache.init_app(app)
+upcoming_counts.init_app(app)
+genre_facets.init_app(app)
+assets.init_app(app)
+app.register_blueprint(api)
+autocomplete.init_app(app)
 
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
+LOCALE = Locale.parse('en')
+DATETIME_FORMATS = {
+  'full' : "EEEE MMMM, d, y 'at' h:mma",
+  'medium' : "EE MM, dd, y h:mma",
+}
+DAY_NAMES = LOCALE.days['format']['wide']
+SHORT_DAY_NAMES = LOCALE.days['format']['abbreviated']
+MONTH_NAMES = LOCALE.months['format']['wide']
+PERIODS = LOCALE.periods
+
+def _hour_and_period(date):
+  return date.hour % 12 or 12, PERIODS['am' if date.hour < 12 else 'pm']
+
+def format_full(date):
+  # same output as the 'full' pattern, without going through babel
+  hour, period = _hour_and_period(date)
+  return f"{DAY_NAMES[date.weekday()]} {MONTH_NAMES[date.month]}, {date.day}, {date.year} at {hour}:{date.minute:02d}{period}"
+
+def format_medium(date):
+  hour, period = _hour_and_period(date)
+  return f"{SHORT_DAY_NAMES[date.weekday()]} {date.month:02d}, {date.day:02d}, {date.year} {hour}:{date.minute:02d}{period}"
+
+FAST_DATETIME_FORMATS = {
+  'full' : format_full,
+  'medium' : format_medium,
+}
+
 def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format, locale='en')
+  # templates get datetimes from the controllers; strings are still accepted
+  date = dateutil.parser.parse(value) if isinstance(value, str) else value
+  fast_format = FAST_DATETIME_FORMATS.get(format)
+  if fast_format is not None:
+    return fast_format(date)
+  # babel's named formats ( 'short', 'long', ... ) and patterns
+  return babel.dates.format_datetime(date, DATETIME_FORMATS.get(format, format), locale=LOCALE)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Streaming.
+#----------------------------------------------------------------------------#
+
+def stream_template(template_name, **context):
+  # like render_template, but sends the page out while it is being rendered
+  app.update_template_context(context)
+  template = app.jinja_env.get_template(template_name)
+  stream = template.stream(context)
+  stream.enable_buffering()
+  return Response(stream_with_context(stream))
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 @app.route('/')
+@query_budget(0)
+@conditional()
 def index():
   return render_template('pages/home.html')
 
@@ -51,128 +127,172 @@ def index():
 #  Venues
 #  ----------------------------------------------------------------
 
-@app.route('/venues')
-def venues():
-
-  venues = Venue.query.all()
+def venue_areas(session, genres=(), **paging):
+  # a page of venues ( keyset on name, id ), then their memoized
+  # number of upcoming shows
+  query = session.query(Venue.id, Venue.name, Venue.city, Venue.state)
+  query = filter_genres(query, Venue, genres, session)
+  page = keyset_page(query, (Venue.name, Venue.id), **paging)
+  facets = facet_counts(query, Venue, genres, session)
+  num_upcoming = upcoming_counts.get_many('venue', [result.id for result in page.items], session)
 
   data = []
-  current_time = datetime.now()
+  areas = {}
+  for result in page.items :
+    #aggregate data by location
+    area = areas.get((result.city, result.state))
+    if area is None :
+      area = {
+        "city" : result.city,
+        "state" : result.state,
+        "venues" : []
+      }
+      areas[(result.city, result.state)] = area
+      data.append(area)
+
+    area["venues"].append({
+      "id" : result.id,
+      "name" : result.name,
+      "num_upcoming" : num_upcoming[result.id]
+      })
+  data.sort(key=lambda area: (area["state"] or '', area["city"] or ''))
+  return data, page, facets
 
-  
-  locations = set()
-  for venue in venues : 
-    locations.add((venue.city, venue.state))
-  locations = list(locations)
-
-  for location in locations : 
-    """ we can have multiple venues in one location"""
-    #instanciate a venue data list to contain all data for a specific venue in a specific location
-    single_venue_data = []
-    #loop over venues 
-    for venue in venues :
-      #aggregate data by location
-      if (location[0] == venue.city) and (location[1] == venue.state):
-        shows_per_venue_in_location = Show.query.filter_by(venue_id=venue.id).all()
-        num_upcoming = 0 
-        for show in shows_per_venue_in_location : 
-          if show.start_time > current_time :
-            num_upcoming += 1
-        
-        single_venue_data.append({
-          "id" : venue.id,
-          "name" : venue.name,
-          "num_upcoming" : num_upcoming
-          })
+@app.route('/venues')
+@query_budget(5)
+@conditional('Venue', 'Show', timed=True)
+def venues():
+  genres = requested_genres()
+  data, page, facets = venue_areas(db.session, genres, **page_args())
+  return render_template('pages/venues.html', areas=data, page=page, facets=facets, genres=genres)
 
+def search_results(session, model, kind, search_term, genres=()):
+  count, search_result = search(model, search_term, app.config['SEARCH_RESULTS_LIMIT'], session, genres)
+  num_upcoming = upcoming_counts.get_many(kind, [result.id for result in search_result], session)
+  data=[]
+  for result in search_result:
     data.append({
-      "city" : location[0],
-      "state" : location[1],
-      "venues" : single_venue_data
+      'id': result.id,
+      'name': result.name,
+      'num_upcoming_shows': num_upcoming[result.id]
     })
-  
-  return render_template('pages/venues.html', areas=data)
+  response={
+    "count": count,
+    "data": data,
+    "facets": search_facets(model, search_term, session, genres)
+    }
+  return response
 
 @app.route('/venues/search', methods=['POST'])
+@query_budget(4)
 def search_venues():
 
   search_term = request.form.get('search_term', '')
-  search_result = db.session.query(Venue).filter(Venue.name.ilike(f'%{search_term}%')).all()
-  data=[]
-  for result in search_result:
-    current_time = datetime.now()
+  genres = requested_genres()
+  response = search_results(db.session, Venue, 'venue', search_term, genres)
+  
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''), genres=genres)
+
+def near_results(session, latitude, longitude, radius):
+  count, venues = nearby(latitude, longitude, radius, app.config['NEAR_RESULTS_LIMIT'], session)
+  num_upcoming = upcoming_counts.get_many('venue', [venue.id for venue in venues], session)
+  data = []
+  for venue in venues:
     data.append({
-      'id': result.id,
-      'name': result.name,
-      'num_upcoming_shows': len(db.session.query(Show).filter(Show.venue_id == result.id).filter(Show.start_time > current_time ).all())
+      'id': venue.id,
+      'name': venue.name,
+      'city': venue.city,
+      'state': venue.state,
+      'distance': venue.distance,
+      'num_upcoming_shows': num_upcoming[venue.id]
     })
-  response={
-    "count": len(search_result),
+  return {
+    "count": count,
     "data": data
     }
-  
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+@app.route('/venues/near')
+@query_budget(5)
+@conditional('Venue', 'Show', timed=True)
+def venues_near():
+  latitude, longitude, radius, place = near_args()
+  results = None
+  if latitude is not None:
+    results = near_results(db.session, latitude, longitude, radius)
+  return render_template('pages/venues_near.html', results=results, place=place, radius=radius, states=states_choices)
+
+def venue_detail(venue_id):
+  # the venue, its shows and their artists in one round trip
+  venue = db.session.query(Venue
+    ).outerjoin(Venue.shows
+    ).outerjoin(Show.artist
+    ).options(contains_eager(Venue.shows).contains_eager(Show.artist)
+    ).filter(Venue.id == venue_id
+    ).order_by(Show.start_time
+    ).one_or_none()
+  if not venue:
+    return None, None
+
+  current_time = datetime.now()
+  past_shows = []
+  upcoming_shows = []
+  # the page goes stale when the next upcoming show moves to the past shows
+  next_start = None
+  for show in venue.shows :
+    if show.start_time > current_time :
+      shows_list = upcoming_shows
+      next_start = next_start or show.start_time
+    else :
+      shows_list = past_shows
+    shows_list.append({
+      "artist_id" : show.artist.id,
+      "artist_name" : show.artist.name,
+      "artist_image_link" : show.artist.image_link,
+      "start_time" : show.start_time
+    })
+
+  data = {
+    "id" : venue.id,
+    "name": venue.name,
+    "genres": venue.genres,
+    "address": venue.address,
+    "city": venue.city,
+    "state": venue.state,
+    "phone": venue.phone,
+    "website": venue.website_link,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows" : upcoming_shows,
+    "past_shows_count" : len(past_shows),
+    "upcoming_shows_count" : len(upcoming_shows)}
+  return data, next_start
 
 @app.route('/venues/<int:venue_id>')
+@query_budget(3)
+@conditional('Venue', 'Artist', 'Show', timed=True)
 def show_venue(venue_id):
 
-  venue = db.session.query(Venue).filter(Venue.id == venue_id).first()
-  if not venue:
+  data = detail_cache.get_or_build('venue', venue_id, venue_detail)
+  if not data:
     return redirect(url_for('index'))
 
-  else :
-    current_time = datetime.now()
-    past_shows_results= db.session.query(Show).join(Artist).filter(Show.venue_id == venue_id).filter(Show.start_time <= current_time ).all()
-    past_shows = []
-    for show in past_shows_results :
-      past_shows.append({
-        "artist_id" : show.artist.id,
-        "artist_name" : show.artist.name,
-        "artist_image_link" : show.artist.image_link,
-        #TypeError: Parser must be a string or character stream, not datetime
-        "start_time" : show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-      })
-
-    upcoming_shows_results= db.session.query(Show).join(Artist).filter(Show.venue_id == venue_id).filter(Show.start_time > current_time ).all()
-    upcoming_shows = []
-    for show in upcoming_shows_results :
-      upcoming_shows.append({
-        "artist_id" : show.artist.id,
-        "artist_name" : show.artist.name,
-        "artist_image_link" : show.artist.image_link,
-        #TypeError: Parser must be a string or character stream, not datetime
-        "start_time" : show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
- 
-    data = {
-      "id" : venue.id,
-      "name": venue.name,
-      "genres": venue.genres,
-      "address": venue.address,
-      "city": venue.city,
-      "state": venue.state,
-      "phone": venue.phone,
-      "website": venue.website_link,
-      "facebook_link": venue.facebook_link,
-      "seeking_talent": venue.seeking_talent,
-      "seeking_description": venue.seeking_description,
-      "image_link": venue.image_link,
-      "past_shows": past_shows,
-      "upcoming_shows" : upcoming_shows,
-      "past_shows_count" : len(past_shows),
-      "upcoming_shows_count" : len(upcoming_shows)}
-
   return render_template('pages/show_venue.html', venue=data)
 
 #  Create Venue
 #  ----------------------------------------------------------------
 
 @app.route('/venues/create', methods=['GET'])
+@query_budget(0)
+@conditional()
 def create_venue_form():
   form = VenueForm()
   return render_template('forms/new_venue.html', form=form)
 
 @app.route('/venues/create', methods=['POST'])
+@query_budget(2)
 def create_venue_submission():
   form = VenueForm(request.form)
   try :
@@ -203,6 +323,7 @@ def create_venue_submission():
   return render_template('pages/home.html')
 
 @app.route('/venues/<venue_id>', methods=['DELETE'])
+@query_budget(6)
 def delete_venue(venue_id):
   venue = db.session.query(Venue).filter(Venue.id == venue_id).first()
   try :
@@ -219,90 +340,111 @@ def delete_venue(venue_id):
 
 #  Artists
 #  ----------------------------------------------------------------
-@app.route('/artists')
-def artists():
-  artists = Artist.query.all()
+def artist_row(artist):
+  return {
+    "id" : artist.id,
+    "name" : artist.name }
+
+def artist_query(session, genres=()):
+  return filter_genres(session.query(Artist.id, Artist.name), Artist, genres, session)
+
+def artist_page(session, genres=(), **paging):
+  query = artist_query(session, genres)
+  page = keyset_page(query, (Artist.name, Artist.id), **paging)
 
   data = []
-  for artist in artists:
-    data.append({
-          "id" : artist.id,
-          "name" : artist.name })
+  for artist in page.items:
+    data.append(artist_row(artist))
+  return data, page, facet_counts(query, Artist, genres, session)
+
+@app.route('/artists')
+@query_budget(3)
+@conditional('Artist')
+def artists():
+  genres = requested_genres()
+  if wants_stream():
+    query = artist_query(db.session, genres)
+    facets = facet_counts(query, Artist, genres, db.session)
+    page = StreamedPage(query, (Artist.name, Artist.id), artist_row, **page_args(stream=True))
+    return stream_template('pages/artists.html', artists=page, page=page, facets=facets, genres=genres)
+
+  data, page, facets = artist_page(db.session, genres, **page_args())
   
-  return render_template('pages/artists.html', artists=data)
+  return render_template('pages/artists.html', artists=data, page=page, facets=facets, genres=genres)
 
 @app.route('/artists/search', methods=['POST'])
+@query_budget(4)
 def search_artists():
   search_term = request.form.get('search_term', '')
-  search_result = db.session.query(Artist).filter(Artist.name.ilike(f'%{search_term}%')).all()
-  data=[]
-  for result in search_result:
-    current_time = datetime.now()
-    data.append({
-      'id': result.id,
-      'name': result.name,
-      'num_upcoming_shows': len(db.session.query(Show).filter(Show.artist_id == result.id).filter(Show.start_time > current_time ).all())
+  genres = requested_genres()
+  response = search_results(db.session, Artist, 'artist', search_term, genres)
+
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''), genres=genres)
+
+def artist_detail(artist_id):
+  # the artist, their shows and the venues in one round trip
+  artist = db.session.query(Artist
+    ).outerjoin(Artist.shows
+    ).outerjoin(Show.venue
+    ).options(contains_eager(Artist.shows).contains_eager(Show.venue)
+    ).filter(Artist.id == artist_id
+    ).order_by(Show.start_time
+    ).one_or_none()
+  if not artist:
+    return None, None
+
+  current_time = datetime.now()
+  past_shows = []
+  upcoming_shows = []
+  # the page goes stale when the next upcoming show moves to the past shows
+  next_start = None
+  for show in artist.shows :
+    if show.start_time > current_time :
+      shows_list = upcoming_shows
+      next_start = next_start or show.start_time
+    else :
+      shows_list = past_shows
+    shows_list.append({
+      "venue_id" : show.venue.id,
+      "venue_name" : show.venue.name,
+      "venue_image_link" : show.venue.image_link,
+      "start_time" : show.start_time
     })
-  response={
-    "count": len(search_result),
-    "data": data
-    }
 
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  data = {
+    "id" : artist.id,
+    "name": artist.name,
+    "genres": artist.genres,
+    "city": artist.city,
+    "state": artist.state,
+    "phone": artist.phone,
+    "website": artist.website_link,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows" : upcoming_shows,
+    "past_shows_count" : len(past_shows),
+    "upcoming_shows_count" : len(upcoming_shows)}
+  return data, next_start
 
 @app.route('/artists/<int:artist_id>')
+@query_budget(3)
+@conditional('Venue', 'Artist', 'Show', timed=True)
 def show_artist(artist_id):
 
-  artist = db.session.query(Artist).filter(Artist.id == artist_id).first()
-  if not artist:
+  data = detail_cache.get_or_build('artist', artist_id, artist_detail)
+  if not data:
     return redirect(url_for('index'))
 
-  else :
-    current_time = datetime.now()
-    past_shows_results= db.session.query(Show).join(Venue).filter(Show.artist_id == artist_id).filter(Show.start_time <= current_time ).all()
-    past_shows = []
-    for show in past_shows_results :
-      past_shows.append({
-        "venue_id" : show.venue.id,
-        "venue_name" : show.venue.name,
-        "venue_image_link" : show.venue.image_link,
-        #TypeError: Parser must be a string or character stream, not datetime
-        "start_time" : show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-      })
-
-    upcoming_shows_results= db.session.query(Show).join(Venue).filter(Show.artist_id == artist_id).filter(Show.start_time > current_time ).all()
-    upcoming_shows = []
-    for show in upcoming_shows_results :
-      upcoming_shows.append({
-        "venue_id" : show.venue.id,
-        "venue_name" : show.venue.name,
-        "venue_image_link" : show.venue.image_link,
-        #TypeError: Parser must be a string or character stream, not datetime
-        "start_time" : show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-    })
-
-    data = {
-      "id" : artist.id,
-      "name": artist.name,
-      "genres": artist.genres,
-      "city": artist.city,
-      "state": artist.state,
-      "phone": artist.phone,
-      "website": artist.website_link,
-      "facebook_link": artist.facebook_link,
-      "seeking_venue": artist.seeking_venue,
-      "seeking_description": artist.seeking_description,
-      "image_link": artist.image_link,
-      "past_shows": past_shows,
-      "upcoming_shows" : upcoming_shows,
-      "past_shows_count" : len(past_shows),
-      "upcoming_shows_count" : len(upcoming_shows)}
-
   return render_template('pages/show_artist.html', artist=data)
 
 #  Update
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
+@query_budget(2)
+@conditional('Artist')
 def edit_artist(artist_id):
   form = ArtistForm()
   artist = db.session.query(Artist).filter(Artist.id == artist_id).first()
@@ -321,19 +463,20 @@ def edit_artist(artist_id):
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
+@query_budget(4)
 def edit_artist_submission(artist_id):
 
   artist = db.session.query(Artist).filter(Artist.id == artist_id).first()
   form = ArtistForm(request.form)
   try : 
     artist.name = form.name.data
-    artist.city = form.city.data,
-    artist.state = form.state.data,
-    artist.phone = form.phone.data,
-    artist.genres = form.genres.data,
-    artist.image_link = form.image_link.data,
-    artist.facebook_link = form.facebook_link.data,
-    artist.website_link = form.website_link.data,
+    artist.city = form.city.data
+    artist.state = form.state.data
+    artist.phone = form.phone.data
+    artist.genres = form.genres.data
+    artist.image_link = form.image_link.data
+    artist.facebook_link = form.facebook_link.data
+    artist.website_link = form.website_link.data
     artist.seeking_venue = True if 'seeking_venue' in request.form else False 
     artist.seeking_description = form.seeking_description.data
   
@@ -349,6 +492,8 @@ def edit_artist_submission(artist_id):
   return redirect(url_for('show_artist', artist_id=artist_id))
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
+@query_budget(2)
+@conditional('Venue')
 def edit_venue(venue_id):
   form = VenueForm()
   venue = db.session.query(Venue).filter(Venue.id == venue_id).first()
@@ -368,6 +513,7 @@ def edit_venue(venue_id):
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
+@query_budget(4)
 def edit_venue_submission(venue_id):
 
   venue = db.session.query(Venue).filter(Venue.id == venue_id).first()
@@ -398,11 +544,14 @@ def edit_venue_submission(venue_id):
 #  ----------------------------------------------------------------
 
 @app.route('/artists/create', methods=['GET'])
+@query_budget(0)
+@conditional()
 def create_artist_form():
   form = ArtistForm()
   return render_template('forms/new_artist.html', form=form)
 
 @app.route('/artists/create', methods=['POST'])
+@query_budget(2)
 def create_artist_submission():
   form = ArtistForm(request.form)
   try :
@@ -436,41 +585,83 @@ def create_artist_submission():
 #  Shows
 #  ----------------------------------------------------------------
 
+def show_row(show):
+  return {
+    "venue_id" : show.venue_id,
+    "venue_name": show.venue_name,
+    "artist_id": show.artist_id,
+    "artist_name": show.artist_name,
+    "artist_image_link": show.artist_image_link,
+    "start_time" : show.start_time
+    }
+
+def show_query(session):
+  return session.query(
+      Show.id,
+      Show.start_time,
+      Show.venue_id,
+      Venue.name.label('venue_name'),
+      Show.artist_id,
+      Artist.name.label('artist_name'),
+      Artist.image_link.label('artist_image_link')
+    ).join(Venue).join(Artist)
+
+def show_page(session, **paging):
+  page = keyset_page(show_query(session), (Show.start_time, Show.id), **paging)
+  data = []
+  for show in page.items : 
+    data.append(show_row(show))
+  return data, page
+
 @app.route('/shows')
+@query_budget(2)
+@conditional('Show', 'Venue', 'Artist')
 def shows():
-  data = []
-  shows = db.session.query(Show).join(Venue).join(Artist).all()
-  for show in shows : 
-    data.append({
-      "venue_id" : show.venue_id,
-      "venue_name": show.venue.name,
-      "artist_id": show.artist_id,
-      "artist_name": show.artist.name,
-      "artist_image_link": show.artist.image_link,
-      #TypeError: Parser must be a string or character stream, not datetime
-      "start_time" : show.start_time.strftime('%Y-%m-%d %H:%M:%S')
-       })
+  if wants_stream():
+    page = StreamedPage(show_query(db.session), (Show.start_time, Show.id), show_row, **page_args(stream=True))
+    return stream_template('pages/shows.html', shows=page, page=page)
+
+  data, page = show_page(db.session, **page_args())
 
-  return render_template('pages/shows.html', shows=data)
+  return render_template('pages/shows.html', shows=data, page=page)
 
 @app.route('/shows/create')
+@query_budget(0)
+@conditional()
 def create_shows():
   # renders form. do not touch.
   form = ShowForm()
   return render_template('forms/new_show.html', form=form)
 
 @app.route('/shows/create', methods=['POST'])
+@query_budget(3)
 def create_show_submission():
   form = ShowForm(request.form)
   try : 
+    # the booking check needs a valid slot
+    for field in (form.start_time, form.duration):
+      if not field.validate(form):
+        raise ValueError(f"{field.name}: {', '.join(field.errors)}")
     new_show = Show(venue_id = form.venue_id.data,
     artist_id = form.artist_id.data,
-    start_time = form.start_time.data)
+    start_time = form.start_time.data,
+    duration = form.duration.data or DEFAULT_SHOW_DURATION)
 
+    # one index range scan; the exclusion constraints catch concurrent bookings on Postgres
+    check_booking(int(form.venue_id.data), int(form.artist_id.data), new_show.start_time, new_show.duration)
     db.session.add(new_show)
-    db.session.commit()
+    try :
+      db.session.commit()
+    except IntegrityError as e :
+      if not is_exclusion_violation(e):
+        raise
+      db.session.rollback()
+      raise BookingConflict(conflicts(new_show.venue_id, new_show.artist_id, new_show.start_time, new_show.duration))
     flash('Show was successfully listed!')
 
+  except BookingConflict as e :
+    db.session.rollback()
+    flash(f'The show could not be listed, its slot is taken: {e}')
   except ValueError as e: 
     print(e)
     db.session.rollback()
@@ -0,0 +1,209 @@
+"""Fingerprinted, precompressed static files.
+
+``flask build-assets`` copies every file under static/ to static/dist/
+with a content hash in its name ( css/main.css -> css/main.1a2b3c4d5e6f.css ),
+rewrites the url()s in the stylesheets to the hashed names, writes .gz
+( and .br when the ``brotli`` package is installed ) next to the text
+files, and records the mapping in static/dist/manifest.json. The files of
+the previous build are kept ( pages cached by clients, and workers not yet
+restarted, still point at them ); older ones are removed.
+
+Once a manifest exists, ``url_for('static', filename=...)`` points at the
+hashed file. Hashed files are served with far-future immutable cache
+headers and, when the client accepts it, as their precompressed variant.
+Without a manifest everything is served from static/ as before. The
+digest of the manifest in use is part of the conditional GET token of the
+pages ( conditional.py ), so a new build also changes their validators.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+import click
+from flask import Blueprint, current_app, request, send_from_directory
+from flask.cli import with_appcontext
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional, only .gz variants are written without it
+    brotli = None
+
+DIST_FOLDER = 'dist'
+MANIFEST_NAME = 'manifest.json'
+ONE_YEAR = 365 * 24 * 3600
+
+# files worth compressing; images and woff fonts are compressed already
+COMPRESSIBLE = {'.css', '.js', '.map', '.json', '.svg', '.txt', '.html', '.eot', '.ttf', '.otf'}
+# ( content-coding, file suffix ), preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+assets = Blueprint('assets', __name__)
+
+
+def _dist_path(app):
+    return os.path.join(app.static_folder, DIST_FOLDER)
+
+
+def _hashed_name(path, content):
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    root, ext = posixpath.splitext(path)
+    return f'{root}.{digest}{ext}'
+
+
+def _source_files(static_folder):
+    """Relative ( posix ) paths of the files to fingerprint, css last."""
+    paths = []
+    for root, dirs, files in os.walk(static_folder):
+        dirs[:] = [name for name in dirs
+                   if not name.startswith('.') and os.path.join(root, name) != os.path.join(static_folder, DIST_FOLDER)]
+        for name in files:
+            if not name.startswith('.'):
+                paths.append(os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, '/'))
+    # stylesheets point at fonts and images, so those need their hashed names first
+    return sorted(paths, key=lambda path: (path.endswith('.css'), path))
+
+
+def _rewrite_css_urls(path, content, manifest):
+    base = posixpath.dirname(path)
+
+    def replace(match):
+        quote, url = match.groups()
+        if re.match(r'^([a-z]+:|//|#|/)', url, re.I):
+            return match.group(0)
+        target, suffix = re.match(r'^([^?#]*)(.*)$', url).groups()
+        resolved = posixpath.normpath(posixpath.join(base, target))
+        if resolved not in manifest:
+            return match.group(0)
+        hashed = posixpath.relpath(manifest[resolved], base or '.')
+        return f'url({quote}{hashed}{suffix}{quote})'
+
+    return CSS_URL.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+
+def _write_variants(path, content):
+    """Write the compressed variants of ``path`` that are smaller than the original."""
+    written = []
+    variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(content, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(content) * 0.95:
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+            written.append(suffix)
+    return written
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _prune(dist, keep):
+    """Remove the files of ``dist`` that are not ``keep`` ( hashed paths ) or their variants."""
+    keep = {os.path.join(dist, *path.split('/')) for path in keep}
+    keep |= {path + suffix for path in keep for encoding, suffix in ENCODINGS}
+    keep.add(os.path.join(dist, MANIFEST_NAME))
+    for root, dirs, files in os.walk(dist, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            if path not in keep:
+                os.remove(path)
+        if root != dist and not os.listdir(root):
+            os.rmdir(root)
+
+
+def build(app):
+    """Fingerprint and compress the static files of ``app``; return the manifest.
+
+    Files are content addressed, so the previous build is kept in place and
+    only the files neither build refers to are removed.
+    """
+    dist = _dist_path(app)
+    manifest_path = os.path.join(dist, MANIFEST_NAME)
+    previous = _read_manifest(manifest_path)
+    manifest = {}
+    for path in _source_files(app.static_folder):
+        with open(os.path.join(app.static_folder, path), 'rb') as f:
+            content = f.read()
+        if path.endswith('.css'):
+            content = _rewrite_css_urls(path, content, manifest)
+        hashed = _hashed_name(path, content)
+        target = os.path.join(dist, *hashed.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        if posixpath.splitext(path)[1].lower() in COMPRESSIBLE:
+            _write_variants(target, content)
+        manifest[path] = hashed
+    os.makedirs(dist, exist_ok=True)
+    # written aside and renamed, so a starting worker never reads half of it
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    _prune(dist, set(manifest.values()) | set(previous.values()))
+    return manifest
+
+
+def manifest_version(app):
+    """``( digest, mtime )`` of the manifest ``app`` serves, or None without one."""
+    return app.extensions.get('assets_manifest')
+
+
+@click.command('build-assets')
+@with_appcontext
+def build_assets_command():
+    """Fingerprint and precompress static/ into static/dist/."""
+    manifest = build(current_app)
+    click.echo(f'{len(manifest)} files written to {_dist_path(current_app)}'
+               + ('' if brotli is not None else ' ( gzip only, install brotli for .br )'))
+
+
+@assets.route(f'/static/{DIST_FOLDER}/<path:filename>')
+def hashed_static(filename):
+    """Serve a fingerprinted file, precompressed if the client allows."""
+    dist = _dist_path(current_app)
+    if safe_join(dist, filename) is None:
+        raise NotFound()
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if request.accept_encodings[encoding] and os.path.isfile(os.path.join(dist, filename + suffix)):
+            response = send_from_directory(dist, filename + suffix, mimetype=mimetype, max_age=ONE_YEAR)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(dist, filename, max_age=ONE_YEAR)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    """Register the build command and, if a manifest was built, the hashed URLs."""
+    app.cli.add_command(build_assets_command)
+    app.register_blueprint(assets)
+
+    manifest_path = os.path.join(_dist_path(app), MANIFEST_NAME)
+    if not app.config['ASSETS_USE_MANIFEST'] or not os.path.isfile(manifest_path):
+        return
+    with open(manifest_path, 'rb') as f:
+        content = f.read()
+    manifest = json.loads(content)
+    app.extensions['assets_manifest'] = (hashlib.sha256(content).hexdigest()[:12], os.path.getmtime(manifest_path))
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = f"{DIST_FOLDER}/{manifest[values['filename']]}"
@@ -0,0 +1,314 @@
+"""Name autocomplete for venues and artists: ``/autocomplete?q=``.
+
+Answered from an in-process prefix index: two sorted arrays searched with
+bisect, one keyed by the whole name and one by every later word of it, so
+``roo`` finds "The Blue Room" after the names starting with "roo". A query
+is a bisect and a scan of at most ``limit`` entries per array.
+
+Requests only read the index, under its lock; they never query the
+database. A daemon thread of each process, started by its first request,
+builds the index and rebuilds it in the background whenever the table
+versions of conditional.py have moved, checked every
+AUTOCOMPLETE_REFRESH_SECONDS: that picks up writes of other processes
+( other workers, ``flask import`` ). Until the first build is done
+suggestions are empty. ORM writes of venues and artists in this process
+( the create, edit and delete handlers ) update the index as soon as their
+transaction commits, including while a rebuild is running.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from flask import current_app, request, url_for
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from budget import query_budget
+from models import db, Venue, Artist, TableVersion
+
+MODELS = {
+    'venue': Venue,
+    'artist': Artist,
+}
+DETAIL_ENDPOINTS = {
+    'venue': ('show_venue', 'venue_id'),
+    'artist': ('show_artist', 'artist_id'),
+}
+PENDING_KEY = 'autocomplete_changes'
+
+logger = logging.getLogger('fyyur.autocomplete')
+
+
+def normalize(name):
+    """Case and accent insensitive form of ``name`` with single spaces."""
+    decomposed = unicodedata.normalize('NFKD', name.casefold())
+    return ' '.join(''.join(c for c in decomposed if not unicodedata.combining(c)).split())
+
+
+def _keys(name):
+    """The whole name key and the keys starting at each later word."""
+    key = normalize(name)
+    words = []
+    position = key.find(' ')
+    while position != -1:
+        words.append(key[position + 1:])
+        position = key.find(' ', position + 1)
+    return key, words
+
+
+class PrefixIndex(object):
+    """Sorted ``(key, kind, id)`` arrays over the names of venues and artists."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.names = []
+        self.words = []
+        self.entities = {}
+        self.entry_bytes = 0
+
+    def _entry_size(self, entry):
+        return sys.getsizeof(entry) + sys.getsizeof(entry[0])
+
+    def _add(self, kind, id, name):
+        key, words = _keys(name)
+        self.entities[(kind, id)] = name
+        self.entry_bytes += sys.getsizeof(name)
+        for array, keys in ((self.names, [key]), (self.words, words)):
+            for word in keys:
+                entry = (word, kind, id)
+                insort(array, entry)
+                self.entry_bytes += self._entry_size(entry)
+
+    def _remove(self, kind, id):
+        name = self.entities.pop((kind, id), None)
+        if name is None:
+            return
+        self.entry_bytes -= sys.getsizeof(name)
+        key, words = _keys(name)
+        for array, keys in ((self.names, [key]), (self.words, words)):
+            for word in keys:
+                entry = (word, kind, id)
+                i = bisect_left(array, entry)
+                if i < len(array) and array[i] == entry:
+                    del array[i]
+                    self.entry_bytes -= self._entry_size(entry)
+
+    def put(self, kind, id, name):
+        with self.lock:
+            self._remove(kind, id)
+            if name:
+                self._add(kind, id, name)
+
+    def remove(self, kind, id):
+        with self.lock:
+            self._remove(kind, id)
+
+    def load(self, rows):
+        """Replace the contents with ``(kind, id, name)`` rows, sorting once."""
+        names, words, entities, entry_bytes = [], [], {}, 0
+        for kind, id, name in rows:
+            if not name:
+                continue
+            key, later = _keys(name)
+            entities[(kind, id)] = name
+            entry_bytes += sys.getsizeof(name)
+            names.append((key, kind, id))
+            words.extend((word, kind, id) for word in later)
+        names.sort()
+        words.sort()
+        entry_bytes += sum(self._entry_size(entry) for entry in names)
+        entry_bytes += sum(self._entry_size(entry) for entry in words)
+        with self.lock:
+            self.names, self.words, self.entities, self.entry_bytes = names, words, entities, entry_bytes
+
+    def complete(self, prefix, kind=None, limit=10):
+        """Up to ``limit`` ``(kind, id, name)`` whose name or a word of it starts with ``prefix``."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        # writers shift the arrays in place: a bisect and a short scan under the lock
+        with self.lock:
+            return self._complete(prefix, kind, limit)
+
+    def _complete(self, prefix, kind, limit):
+        found = []
+        seen = set()
+        for array in (self.names, self.words):
+            i = bisect_left(array, (prefix,))
+            while i < len(array) and len(found) < limit:
+                key, entry_kind, id = array[i]
+                if not key.startswith(prefix):
+                    break
+                i += 1
+                if (kind is None or entry_kind == kind) and (entry_kind, id) not in seen:
+                    seen.add((entry_kind, id))
+                    name = self.entities.get((entry_kind, id))
+                    if name is not None:
+                        found.append((entry_kind, id, name))
+            if len(found) >= limit:
+                break
+        return found
+
+    def stats(self):
+        """Entries and approximate memory footprint in bytes ( keys, names, tuples, arrays, map )."""
+        with self.lock:
+            return self._stats()
+
+    def _stats(self):
+        return {
+            'entities': len(self.entities),
+            'entries': len(self.names) + len(self.words),
+            'bytes': (self.entry_bytes + sys.getsizeof(self.names) + sys.getsizeof(self.words)
+                      + sys.getsizeof(self.entities)),
+        }
+
+
+class Autocomplete(object):
+    """The prefix index of the app, built and kept fresh by a background thread."""
+
+    def __init__(self, app=None):
+        self.index = PrefixIndex()
+        self.app = None
+        self.versions = None
+        self.refresh_seconds = 30
+        self.lock = threading.Lock()
+        self.pid = None
+        # committed changes seen while a build reads the tables, applied after it
+        self.replay = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.refresh_seconds = app.config['AUTOCOMPLETE_REFRESH_SECONDS']
+
+        @app.before_request
+        def start_autocomplete_refresh():
+            self.start()
+
+        @app.route('/autocomplete')
+        @query_budget(0)
+        def autocomplete():
+            kind = request.args.get('kind')
+            if kind not in MODELS:
+                kind = None
+            limit = request.args.get('limit', current_app.config['AUTOCOMPLETE_LIMIT'], type=int)
+            limit = max(1, min(limit, current_app.config['AUTOCOMPLETE_MAX_LIMIT']))
+            data = []
+            # the detail page URLs differ by their trailing id only
+            prefixes = {}
+            for entry_kind, id, name in self.index.complete(request.args.get('q', ''), kind, limit):
+                prefix = prefixes.get(entry_kind)
+                if prefix is None:
+                    endpoint, argument = DETAIL_ENDPOINTS[entry_kind]
+                    prefix = prefixes[entry_kind] = url_for(endpoint, **{argument: 0})[:-1]
+                data.append({'kind': entry_kind, 'id': id, 'name': name, 'url': f'{prefix}{id}'})
+            body = json.dumps({'data': data}, separators=(',', ':'), ensure_ascii=False)
+            return current_app.response_class(body, mimetype='application/json')
+
+    def start(self):
+        # the thread does not survive a fork: start one per process
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.versions = None
+        threading.Thread(target=self._refresh_forever, name='autocomplete', daemon=True).start()
+
+    def _refresh_forever(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    self.refresh()
+            except Exception:
+                logger.exception('autocomplete index refresh failed')
+            time.sleep(self.refresh_seconds)
+
+    def _table_versions(self):
+        return dict(db.session.query(TableVersion.table_name, TableVersion.version)
+                    .filter(TableVersion.table_name.in_([model.__tablename__ for model in MODELS.values()])))
+
+    def refresh(self):
+        """Build the index, or rebuild it when the names changed since the last build."""
+        # versions first: a write committed while the rows are read moves them again
+        versions = self._table_versions()
+        if versions == self.versions:
+            return
+        with self.lock:
+            self.replay = []
+        try:
+            rows = []
+            for kind, model in MODELS.items():
+                rows.extend((kind, id, name) for id, name in db.session.query(model.id, model.name))
+            self.index.load(rows)
+            # under the lock, so that later commits are applied after these
+            with self.lock:
+                for kind, id, name in self.replay:
+                    self.index.put(kind, id, name)
+                self.versions = versions
+        finally:
+            with self.lock:
+                self.replay = None
+
+    def apply(self, changes):
+        """Apply committed ``(kind, id, name)`` changes ( name None: deleted )."""
+        with self.lock:
+            if self.replay is not None:
+                self.replay.extend(changes)
+            elif self.versions is None:
+                # an index not built yet loads the committed names when it is
+                return
+        for kind, id, name in changes:
+            self.index.put(kind, id, name)
+
+    def stats(self):
+        return self.index.stats()
+
+
+autocomplete = Autocomplete()
+
+
+# ---------------------------------------------------------------------------#
+# Incremental updates from the ORM.
+# ---------------------------------------------------------------------------#
+
+def _kind(obj):
+    for kind, model in MODELS.items():
+        if isinstance(obj, model):
+            return kind
+    return None
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    changes = session.info.setdefault(PENDING_KEY, [])
+    for obj in list(session.new) + list(session.dirty):
+        kind = _kind(obj)
+        if kind is not None:
+            changes.append((kind, obj.id, obj.name))
+    for obj in session.deleted:
+        kind = _kind(obj)
+        if kind is not None:
+            changes.append((kind, obj.id, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_changes(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    if changes:
+        autocomplete.apply(changes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_changes(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
@@ -0,0 +1,64 @@
+"""Requests per second of the JSON API next to the HTML page it mirrors.
+
+    python -m benchmarks.api_throughput [--seconds S] [--shows N]
+
+Runs against DATABASE_URL, or a throwaway SQLite file seeded with a
+generated catalogue of N shows ( benchmarks.catalogue ) when it is not set. Both routes go through the Flask test client with the
+detail cache and conditional GET turned off, so each request does the
+full work.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def throughput(client, url, seconds):
+    requests = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        requests += 1
+    return requests / (time.perf_counter() - started), len(response.data)
+
+
+PAIRS = [
+    ('/shows', '/api/v1/shows'),
+    ('/artists', '/api/v1/artists'),
+    ('/venues', '/api/v1/venues?fields=id,name,city,state,num_upcoming_shows'),
+    ('/venues/1', '/api/v1/venues/1'),
+    ('/artists/1', '/api/v1/artists/1'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=2.0)
+    parser.add_argument('--shows', type=int, default=5000)
+    args = parser.parse_args()
+
+    seeded = 'DATABASE_URL' not in os.environ
+    if seeded:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'fyyur.db')
+
+    from app import app
+    from benchmarks.catalogue import seed_catalogue
+    from cache import detail_cache
+    from models import db
+    app.config.update(CONDITIONAL_GET=False, DETAIL_CACHE_BACKEND='null')
+    detail_cache.init_app(app)
+    with app.app_context():
+        if seeded:
+            seed_catalogue(db, max(1, args.shows // 20), max(1, args.shows // 10), args.shows)
+
+    client = app.test_client()
+    print(f"{'route':60} {'req/s':>8} {'bytes':>8}")
+    for html, json_url in PAIRS:
+        for url in (html, json_url):
+            rate, size = throughput(client, url, args.seconds)
+            print(f'{url:60} {rate:8.1f} {size:8d}')
+
+
+if __name__ == '__main__':
+    main()
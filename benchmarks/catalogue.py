@@ -0,0 +1,166 @@
+"""Deterministic synthetic catalogue for the benchmarks.
+
+    python -m benchmarks.catalogue [--venues N] [--artists N] [--shows N] [--seed S]
+
+Seeds DATABASE_URL ( emptied first ) with venues, artists and shows drawn
+from the states and genres of forms.py: states weighted by population,
+one to three genres per entity with a few popular ones, and shows skewed
+towards popular venues and artists, half in the past and half upcoming,
+never two at once for a venue or an artist.
+The same counts and seed give the same catalogue, with show times relative
+to ``anchor`` ( default: today at 20:00 ).
+"""
+import argparse
+import random
+from datetime import datetime, time, timedelta
+
+from forms import genres_choices, states_choices
+
+STATES = [state for state, label in states_choices]
+GENRES = [genre for genre, label in genres_choices]
+
+# millions of inhabitants, the other states count as 3
+STATE_POPULATION = {
+    'CA': 39, 'TX': 29, 'FL': 21, 'NY': 20, 'PA': 13, 'IL': 12.7, 'OH': 11.8, 'GA': 10.7,
+    'NC': 10.4, 'MI': 10, 'NJ': 9.3, 'VA': 8.6, 'WA': 7.7, 'AZ': 7.2, 'MA': 7, 'TN': 6.9,
+    'WY': 0.6, 'VT': 0.6, 'DC': 0.7, 'AK': 0.7, 'ND': 0.8, 'SD': 0.9, 'DE': 1, 'RI': 1.1,
+}
+CITIES = {
+    'CA': ['Los Angeles', 'San Francisco', 'San Diego', 'Oakland', 'Sacramento'],
+    'TX': ['Houston', 'Austin', 'Dallas', 'San Antonio'],
+    'FL': ['Miami', 'Orlando', 'Tampa', 'Jacksonville'],
+    'NY': ['New York', 'Brooklyn', 'Buffalo', 'Rochester'],
+    'PA': ['Philadelphia', 'Pittsburgh'],
+    'IL': ['Chicago', 'Springfield'],
+    'OH': ['Columbus', 'Cleveland', 'Cincinnati'],
+    'GA': ['Atlanta', 'Savannah'],
+    'TN': ['Nashville', 'Memphis'],
+    'WA': ['Seattle', 'Spokane'],
+    'MA': ['Boston', 'Cambridge'],
+    'LA': ['New Orleans', 'Baton Rouge'],
+}
+# the first genres are the popular ones
+GENRE_WEIGHTS = [1 / (rank + 1) for rank in range(len(GENRES))]
+
+# shows start at one of these hours from the anchor and end before the next slot
+SLOT_HOURS = (-2, 0, 2)
+SHOW_DURATIONS = (60, 90, 120)
+# draws of a slot before giving the venue / artist pair up for another one
+SLOT_ATTEMPTS = 20
+
+NAME_WORDS = ['Blue', 'Red', 'Golden', 'Velvet', 'Electric', 'Silver', 'Midnight', 'Royal', 'Wild',
+              'Black', 'Crystal', 'Neon', 'Lucky', 'Rusty', 'Lonely', 'Happy', 'Iron', 'Paper']
+VENUE_WORDS = ['Room', 'Hall', 'Lounge', 'Club', 'Theatre', 'Tavern', 'Garden', 'Cellar', 'Stage']
+ARTIST_WORDS = ['Band', 'Quartet', 'Collective', 'Orchestra', 'Trio', 'Project', 'Kids', 'Sisters']
+
+
+def _zipf_weights(n, exponent=0.8):
+    """Cumulative weights of ``n`` ranks, the first ones the most likely."""
+    total = 0.0
+    cumulative = []
+    for rank in range(1, n + 1):
+        total += 1 / rank ** exponent
+        cumulative.append(total)
+    return cumulative
+
+
+def _entity(rng, words, i, state_weights):
+    state = rng.choices(STATES, weights=state_weights)[0]
+    city = rng.choice(CITIES.get(state, [f'{state} City']))
+    name = f'{rng.choice(NAME_WORDS)} {rng.choice(words)} {i}'
+    slug = name.lower().replace(' ', '')
+    genres = sorted(set(rng.choices(GENRES, weights=GENRE_WEIGHTS, k=rng.randint(1, 3))))
+    return {
+        'name': name,
+        'city': city,
+        'state': state,
+        'phone': f'{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}',
+        'image_link': f'https://images.example.com/{slug}.jpg',
+        'genres': genres,
+        'facebook_link': f'https://www.facebook.com/{slug}',
+        'website_link': f'https://{slug}.example.com',
+        'seeking_description': '',
+    }
+
+
+def generate(venues, artists, shows, seed=0, anchor=None):
+    """Return ``{'venues': rows, 'artists': rows, 'shows': rows}`` in the columns of bulk.KINDS."""
+    rng = random.Random(seed)
+    anchor = anchor or datetime.combine(datetime.now().date(), time(20))
+    state_weights = [STATE_POPULATION.get(state, 3) for state in STATES]
+
+    venue_rows = []
+    for i in range(venues):
+        row = _entity(rng, VENUE_WORDS, i, state_weights)
+        row['address'] = f'{rng.randint(1, 2000)} {rng.choice(NAME_WORDS)} St'
+        row['seeking_talent'] = rng.random() < 0.3
+        venue_rows.append(row)
+
+    artist_rows = []
+    for i in range(artists):
+        row = _entity(rng, ARTIST_WORDS, i, state_weights)
+        row['seeking_venue'] = rng.random() < 0.4
+        artist_rows.append(row)
+
+    # popular venues and artists get most of the shows; ids follow insertion order
+    show_rows = []
+    if shows:
+        venue_weights, artist_weights = _zipf_weights(venues), _zipf_weights(artists)
+        # a venue or artist plays at most one show per slot, so no two shows overlap ( bookings.py )
+        taken = set()
+        draws = 0
+        while len(show_rows) < shows:
+            draws += 1
+            if draws > shows * SLOT_ATTEMPTS:
+                raise ValueError(f'no free slots left for {shows} shows between {venues} venues and {artists} artists')
+            venue_id = rng.choices(range(1, venues + 1), cum_weights=venue_weights)[0]
+            artist_id = rng.choices(range(1, artists + 1), cum_weights=artist_weights)[0]
+            for attempt in range(SLOT_ATTEMPTS):
+                slot = (rng.randint(-365, 365), rng.choice(SLOT_HOURS))
+                if ('venue', venue_id) + slot not in taken and ('artist', artist_id) + slot not in taken:
+                    break
+            else:
+                continue
+            taken.update((('venue', venue_id) + slot, ('artist', artist_id) + slot))
+            show_rows.append({'venue_id': venue_id, 'artist_id': artist_id,
+                              'start_time': anchor + timedelta(days=slot[0], hours=slot[1]),
+                              'duration': rng.choice(SHOW_DURATIONS)})
+    return {'venues': venue_rows, 'artists': artist_rows, 'shows': show_rows}
+
+
+def seed_catalogue(db, venues, artists, shows, seed=0, anchor=None, batch_size=10000):
+    """Empty the database of ``db`` and load a generated catalogue into it."""
+    from bulk import KINDS, insert
+    from conditional import bump_versions
+
+    db.drop_all()
+    db.create_all()
+    catalogue = generate(venues, artists, shows, seed, anchor)
+    for kind in ('venues', 'artists', 'shows'):
+        model, form_class, columns = KINDS[kind]
+        rows = catalogue[kind]
+        for start in range(0, len(rows), batch_size):
+            with db.engine.begin() as connection:
+                insert(connection, model, columns, rows[start:start + batch_size])
+        with db.engine.begin() as connection:
+            bump_versions(connection, model.__tablename__)
+    return {kind: len(rows) for kind, rows in catalogue.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--venues', type=int, default=500)
+    parser.add_argument('--artists', type=int, default=1000)
+    parser.add_argument('--shows', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from app import app
+    from models import db
+    with app.app_context():
+        counts = seed_catalogue(db, args.venues, args.artists, args.shows, args.seed)
+    print(', '.join(f'{count} {kind}' for kind, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Micro-benchmark of the ``datetime`` template filter.
+
+    python -m benchmarks.format_datetime [--number N]
+
+Times the filter on native datetimes for the 'full' and 'medium' fast
+paths and for a custom pattern, next to the babel call it replaces
+( re-parsing a string and formatting with a pattern built on every call ).
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from app import format_datetime, DATETIME_FORMATS
+
+VALUES = [datetime(2021, 1, 1, 9, 30) + timedelta(hours=7 * i, minutes=13 * i) for i in range(100)]
+
+
+def legacy_format_datetime(value, format='medium'):
+    """The filter before it accepted datetimes."""
+    date = dateutil.parser.parse(value)
+    return babel.dates.format_datetime(date, DATETIME_FORMATS.get(format, format), locale='en')
+
+
+def run(number):
+    strings = [value.strftime('%Y-%m-%d %H:%M:%S') for value in VALUES]
+    cases = [
+        ('full', lambda: [format_datetime(value, 'full') for value in VALUES]),
+        ('medium', lambda: [format_datetime(value, 'medium') for value in VALUES]),
+        ('pattern', lambda: [format_datetime(value, 'y-MM-dd HH:mm') for value in VALUES]),
+        ('legacy full', lambda: [legacy_format_datetime(value, 'full') for value in strings]),
+    ]
+    results = {}
+    for name, case in cases:
+        seconds = min(timeit.repeat(case, number=number, repeat=3))
+        results[name] = seconds / (number * len(VALUES)) * 1e6
+        print(f'{name:12} {results[name]:8.2f} us/call')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=100)
+    run(parser.parse_args().number)
+
+
+if __name__ == '__main__':
+    main()
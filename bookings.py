@@ -0,0 +1,145 @@
+"""Double booking checks for shows.
+
+A show takes its venue and its artist from ``start_time`` for ``duration``
+minutes; two shows of the same venue or the same artist may not overlap.
+
+On Postgres two exclusion constraints ( GiST over ``tsrange``, with
+btree_gist for the id ) enforce this for every writer. Elsewhere only the
+checks below do. As no show is longer than MAX_SHOW_DURATION, every show
+overlapping ``[start, end)`` starts in ``(start - MAX_SHOW_DURATION, end)``:
+one range scan of the ( venue_id, start_time ) and ( artist_id,
+start_time ) indexes finds the candidates, whatever the number of shows
+of the venue or artist.
+
+Bulk loads check a chunk against an :class:`IntervalIndex` of the shows
+already booked around it, built with one query per chunk.
+"""
+import bisect
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from sqlalchemy import DDL, event, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Show, MAX_SHOW_DURATION
+
+# the longest a show may last, and so how far before a slot its conflicts may start
+MAX_SPAN = timedelta(minutes=MAX_SHOW_DURATION)
+# the SQLSTATE of exclusion_violation
+EXCLUSION_VIOLATION = '23P01'
+
+Booking = namedtuple('Booking', ['id', 'venue_id', 'artist_id', 'start_time', 'duration'])
+
+EXCLUSION_CONSTRAINTS = {
+    'venue': 'ex_Show_venue_overlap',
+    'artist': 'ex_Show_artist_overlap',
+}
+
+
+def _exclusion_ddl(kind):
+    return (f'ALTER TABLE "Show" ADD CONSTRAINT "{EXCLUSION_CONSTRAINTS[kind]}" EXCLUDE USING gist '
+            f'({kind}_id WITH =, tsrange(start_time, start_time + duration * interval \'1 minute\') WITH &&)')
+
+
+event.listen(Show.__table__, 'after_create',
+             DDL('CREATE EXTENSION IF NOT EXISTS btree_gist').execute_if(dialect='postgresql'))
+for _kind in EXCLUSION_CONSTRAINTS:
+    event.listen(Show.__table__, 'after_create', DDL(_exclusion_ddl(_kind)).execute_if(dialect='postgresql'))
+
+
+class BookingConflict(ValueError):
+    """The show would overlap ``conflicts`` ( :class:`Booking` s ) of its venue or artist."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(', '.join(describe(conflict) for conflict in conflicts) or 'booking conflict')
+
+
+def end_of(start_time, duration):
+    return start_time + timedelta(minutes=duration)
+
+
+def describe(booking):
+    show = f'show {booking.id}' if booking.id is not None else 'another show of this load'
+    return (f'{show} ( venue {booking.venue_id}, artist {booking.artist_id} ) '
+            f'from {booking.start_time:%Y-%m-%d %H:%M} to {end_of(booking.start_time, booking.duration):%H:%M}')
+
+
+def conflicts(venue_id, artist_id, start_time, duration, session=None):
+    """The shows of the venue or the artist overlapping the given slot."""
+    end_time = end_of(start_time, duration)
+    candidates = (session or db.session).query(
+        Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.duration
+    ).filter(
+        or_(Show.venue_id == venue_id, Show.artist_id == artist_id),
+        Show.start_time > start_time - MAX_SPAN,
+        Show.start_time < end_time,
+    ).order_by(Show.start_time)
+    return [Booking(*candidate) for candidate in candidates
+            if end_of(candidate.start_time, candidate.duration) > start_time]
+
+
+def check_booking(venue_id, artist_id, start_time, duration, session=None):
+    """Raise :class:`BookingConflict` when the slot is taken for the venue or the artist."""
+    found = conflicts(venue_id, artist_id, start_time, duration, session)
+    if found:
+        raise BookingConflict(found)
+
+
+def is_exclusion_violation(error):
+    """Whether an IntegrityError comes from one of the exclusion constraints ( concurrent bookings )."""
+    return isinstance(error, IntegrityError) and getattr(error.orig, 'pgcode', None) == EXCLUSION_VIOLATION
+
+
+class IntervalIndex(object):
+    """Booked slots per venue and per artist, sorted by start time.
+
+    Slots are at most MAX_SPAN long, so those overlapping a new slot are
+    found with a bisect to ``start - MAX_SPAN`` and a short scan.
+    """
+
+    def __init__(self):
+        self._starts = defaultdict(list)
+        self._bookings = defaultdict(list)
+
+    def add(self, booking):
+        for key in (('venue', booking.venue_id), ('artist', booking.artist_id)):
+            position = bisect.bisect_right(self._starts[key], booking.start_time)
+            self._starts[key].insert(position, booking.start_time)
+            self._bookings[key].insert(position, booking)
+
+    def overlapping(self, venue_id, artist_id, start_time, duration):
+        end_time = end_of(start_time, duration)
+        found = []
+        for key in (('venue', venue_id), ('artist', artist_id)):
+            starts, bookings = self._starts.get(key, ()), self._bookings.get(key, ())
+            position = bisect.bisect_right(starts, start_time - MAX_SPAN)
+            while position < len(starts) and starts[position] < end_time:
+                booking = bookings[position]
+                if end_of(booking.start_time, booking.duration) > start_time and booking not in found:
+                    found.append(booking)
+                position += 1
+        return found
+
+    @classmethod
+    def around(cls, connection, slots):
+        """The index of the shows booked for the venues and artists of ``slots``, around their times.
+
+        ``slots`` are ``( venue_id, artist_id, start_time, duration )``; one query.
+        """
+        index = cls()
+        if not slots:
+            return index
+        venue_ids = {slot[0] for slot in slots}
+        artist_ids = {slot[1] for slot in slots}
+        first = min(slot[2] for slot in slots) - MAX_SPAN
+        last = max(end_of(slot[2], slot[3]) for slot in slots)
+        rows = connection.execute(
+            select(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.duration).where(
+                or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)),
+                Show.start_time > first,
+                Show.start_time < last,
+            ))
+        for row in rows:
+            index.add(Booking(*row))
+        return index
@@ -0,0 +1,27 @@
+"""Query budgets of the views: ``@query_budget(n)``.
+
+A budget is the most SQL statements one request of the view may issue,
+whatever the size of the catalogue, with the caches cold. Declare it right
+under the route decorator:
+
+    @app.route('/venues')
+    @query_budget(4)
+    @conditional('Venue', 'Show', timed=True)
+    def venues():
+
+tests/test_query_budgets.py runs every route on two catalogue sizes and
+fails when a view passes its budget or its statement count grows with the
+data; instrument.py logs requests over budget to the slow request log.
+"""
+
+
+def query_budget(queries):
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+def view_budget(view):
+    """The declared budget of ``view``, or None."""
+    return getattr(view, 'query_budget', None)
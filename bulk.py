@@ -0,0 +1,400 @@
+"""Bulk loading and dumping of venues, artists and shows: ``flask import``
+and ``flask export``.
+
+Rows are streamed from a CSV or JSONL file, validated with the same forms
+as the create pages ( forms.py ) and inserted in chunks, each committed on
+its own: COPY on Postgres, executemany elsewhere. Shows may reference
+their venue and artist by id ( ``venue_id`` / ``artist_id`` ) or by name
+( ``venue_name`` / ``artist_name`` ); the references of a chunk are
+resolved with one query per table. Shows overlapping a show of their
+venue or artist, booked before or earlier in the load, are rejected
+( see bookings.py ).
+
+After each commit the number of rows consumed is written to a state file,
+so an interrupted import started again with the same state file picks up
+after the last committed chunk.
+
+Exports read a server-side cursor a chunk at a time, so memory stays
+bounded by the chunk size whatever the size of the table. CSV and JSONL
+exports of venues and artists can be imported again as they are.
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import time
+from datetime import datetime
+
+import click
+import dateutil.parser
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+from werkzeug.datastructures import MultiDict
+
+from bookings import Booking, IntervalIndex, describe
+from conditional import bump_versions
+from forms import VenueForm, ArtistForm, ShowForm
+from geo import coordinates
+from models import db, Venue, Artist, Show, DEFAULT_SHOW_DURATION
+
+KINDS = {
+    'venues': (Venue, VenueForm, ['name', 'city', 'state', 'address', 'phone', 'image_link', 'genres',
+                                  'facebook_link', 'website_link', 'seeking_talent', 'seeking_description']),
+    'artists': (Artist, ArtistForm, ['name', 'city', 'state', 'phone', 'image_link', 'genres',
+                                     'facebook_link', 'website_link', 'seeking_venue', 'seeking_description']),
+    'shows': (Show, ShowForm, ['venue_id', 'artist_id', 'start_time', 'duration']),
+}
+# filled in from the city and state of each venue
+GEO_COLUMNS = ('latitude', 'longitude', 'geo_cell')
+BOOLEAN_FIELDS = ('seeking_talent', 'seeking_venue')
+FALSE_VALUES = ('', '0', 'false', 'f', 'no', 'n', 'none', 'null')
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_rows(path, format):
+    """Yield the rows of ``path`` as dicts; genres become lists."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if format == 'csv':
+            for row in csv.DictReader(f):
+                if row.get('genres') is not None:
+                    row['genres'] = [genre.strip() for genre in row['genres'].split(',') if genre.strip()]
+                yield row
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def _formdata(form_class, row):
+    # every form field is present, so a missing value fails validation
+    # instead of falling back to the field default
+    formdata = MultiDict()
+    for name in _field_names(form_class):
+        value = row.get(name)
+        if name == 'genres':
+            for genre in value or []:
+                formdata.add(name, genre)
+        elif name in BOOLEAN_FIELDS:
+            formdata.add(name, '' if str(value).strip().lower() in FALSE_VALUES else 'y')
+        else:
+            formdata.add(name, '' if value is None else str(value))
+    return formdata
+
+
+_field_names_cache = {}
+
+
+def _field_names(form_class):
+    names = _field_names_cache.get(form_class)
+    if names is None:
+        names = _field_names_cache[form_class] = [
+            name for name in dir(form_class)
+            if getattr(getattr(form_class, name), 'field_class', None) is not None
+        ]
+    return names
+
+
+def validate(kind, row):
+    """Return the column values of ``row``, or raise RowError with the form errors."""
+    model, form_class, columns = KINDS[kind]
+    if kind == 'shows':
+        # a reference by name goes through the same required check
+        row = dict(row)
+        row['venue_id'] = row.get('venue_id') or row.get('venue_name')
+        row['artist_id'] = row.get('artist_id') or row.get('artist_name')
+    form = form_class(formdata=_formdata(form_class, row), meta={'csrf': False})
+    if not form.validate():
+        raise RowError('; '.join(f"{name}: {', '.join(errors)}" for name, errors in form.errors.items()))
+    values = {column: form.data[column] for column in columns}
+    if kind == 'shows' and values['duration'] is None:
+        values['duration'] = DEFAULT_SHOW_DURATION
+    return values
+
+
+class References(object):
+    """Venue or artist ids by id or name, looked up a chunk at a time."""
+
+    def __init__(self, model):
+        self.model = model
+        self.ids = set()
+        self.names = {}
+
+    def load(self, connection, refs):
+        ids = {int(ref) for ref, by_id in refs if by_id} - self.ids
+        names = {ref for ref, by_id in refs if not by_id} - set(self.names)
+        if ids:
+            self.ids.update(connection.execute(
+                select(self.model.id).where(self.model.id.in_(ids))).scalars())
+        if names:
+            # names are not unique, the oldest entity wins
+            for name, id in connection.execute(
+                    select(self.model.name, func.min(self.model.id))
+                    .where(self.model.name.in_(names)).group_by(self.model.name)):
+                self.names[name] = id
+
+    def resolve(self, ref, by_id):
+        if by_id:
+            return int(ref) if int(ref) in self.ids else None
+        return self.names.get(ref)
+
+
+def _reference(row, field):
+    """( value, is_an_id ) of the venue / artist reference in a raw show row."""
+    value = row.get(f'{field}_id')
+    if value not in (None, ''):
+        if not str(value).strip().isdigit():
+            raise RowError(f'{field}_id: not an id')
+        return str(value).strip(), True
+    return row.get(f'{field}_name'), False
+
+
+def _copy_value(value):
+    if value is None:
+        return r'\N'
+    if isinstance(value, list):
+        # Postgres array literal
+        return '{' + ','.join('"' + item.replace('\\', '\\\\').replace('"', '\\"') + '"' for item in value) + '}'
+    return value
+
+
+def insert(connection, model, columns, rows):
+    table = model.__table__
+    if model is Venue:
+        # the ORM event placing venues ( geo.py ) does not see these inserts
+        columns = columns + list(GEO_COLUMNS)
+        rows = [dict(row, **coordinates(row['city'], row['state'])) for row in rows]
+    if connection.dialect.name == 'postgresql':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_copy_value(row[column]) for column in columns])
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            f'COPY "{table.name}" ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')', buffer)
+    else:
+        connection.execute(table.insert(), rows)
+
+
+def load_chunk(kind, numbered_rows, references, errors):
+    """Validate and insert one chunk in its own transaction; return ( inserted, rejected )."""
+    model, form_class, columns = KINDS[kind]
+    valid = []
+    rejected = 0
+    for number, row in numbered_rows:
+        try:
+            values = validate(kind, row)
+            if kind == 'shows':
+                values['_refs'] = (_reference(row, 'venue'), _reference(row, 'artist'))
+            valid.append((number, row, values))
+        except RowError as e:
+            rejected += 1
+            errors(number, row, str(e))
+
+    with db.engine.begin() as connection:
+        if kind == 'shows':
+            references['venue'].load(connection, [values['_refs'][0] for number, row, values in valid])
+            references['artist'].load(connection, [values['_refs'][1] for number, row, values in valid])
+            resolved = []
+            for number, row, values in valid:
+                (venue_ref, artist_ref) = values.pop('_refs')
+                values['venue_id'] = references['venue'].resolve(*venue_ref)
+                values['artist_id'] = references['artist'].resolve(*artist_ref)
+                if values['venue_id'] is None or values['artist_id'] is None:
+                    rejected += 1
+                    missing = 'venue' if values['venue_id'] is None else 'artist'
+                    errors(number, row, f'{missing}: no such {missing}')
+                else:
+                    resolved.append((number, row, values))
+            valid = []
+            # against the shows already booked, and the earlier rows of the chunk
+            slots = [(values['venue_id'], values['artist_id'], values['start_time'], values['duration'])
+                     for number, row, values in resolved]
+            booked = IntervalIndex.around(connection, slots)
+            for (number, row, values), slot in zip(resolved, slots):
+                taken = booked.overlapping(*slot)
+                if taken:
+                    rejected += 1
+                    errors(number, row, 'booking conflict: ' + ', '.join(describe(booking) for booking in taken))
+                else:
+                    booked.add(Booking(None, *slot))
+                    valid.append((number, row, values))
+        if valid:
+            insert(connection, model, columns, [values for number, row, values in valid])
+            bump_versions(connection, model.__tablename__)
+    return len(valid), rejected
+
+
+@click.command('import')
+@with_appcontext
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']),
+              help='Input format ( default: from the file extension ).')
+@click.option('--chunk-size', default=10000, show_default=True, help='Rows per committed chunk.')
+@click.option('--state', 'state_path', type=click.Path(dir_okay=False),
+              help='Resume file ( default: PATH.import-state ).')
+@click.option('--errors', 'errors_path', type=click.Path(dir_okay=False),
+              help='Write rejected rows with their errors to this JSONL file.')
+def import_command(kind, path, format, chunk_size, state_path, errors_path):
+    """Bulk load KIND ( venues, artists or shows ) from a CSV or JSONL file."""
+    format = format or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    state_path = state_path or path + '.import-state'
+    done = 0
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            done = json.load(f)['rows']
+        click.echo(f'resuming after row {done}')
+
+    errors_file = open(errors_path, 'a', encoding='utf-8') if errors_path else None
+
+    def errors(number, row, message):
+        if errors_file:
+            errors_file.write(json.dumps({'row': number, 'error': message, 'data': row}, default=str) + '\n')
+
+    references = {'venue': References(Venue), 'artist': References(Artist)}
+    rows = enumerate(read_rows(path, format), 1)
+    rows = itertools.islice(rows, done, None)
+    started = time.perf_counter()
+    inserted = rejected = 0
+    try:
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            chunk_started = time.perf_counter()
+            chunk_inserted, chunk_rejected = load_chunk(kind, chunk, references, errors)
+            inserted += chunk_inserted
+            rejected += chunk_rejected
+            done = chunk[-1][0]
+            with open(state_path, 'w') as f:
+                json.dump({'rows': done}, f)
+            rate = len(chunk) / (time.perf_counter() - chunk_started)
+            click.echo(f'row {done}: {chunk_inserted} inserted, {chunk_rejected} rejected ( {rate:.0f} rows/s )')
+    finally:
+        if errors_file:
+            errors_file.close()
+
+    elapsed = time.perf_counter() - started
+    if os.path.exists(state_path):
+        os.remove(state_path)
+    click.echo(f'{inserted} {kind} inserted, {rejected} rejected in {elapsed:.1f}s '
+               f'( {(inserted + rejected) / elapsed if elapsed else 0:.0f} rows/s )')
+
+
+# ---------------------------------------------------------------------------#
+# Export.
+# ---------------------------------------------------------------------------#
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    # one JSON object per chunk holding a list of values per column
+    'columnar': 'application/x-ndjson',
+}
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_since(since):
+    """``since`` as an id ( int ) or a timestamp ( datetime ); ValueError otherwise."""
+    if since is None or isinstance(since, (int, datetime)):
+        return since
+    since = since.strip()
+    if since.isdigit():
+        return int(since)
+    return dateutil.parser.parse(since)
+
+
+def export_query(kind, since=None, names=False):
+    """The rows of ``kind`` in id order; ``since`` is an id or, for shows, a start time."""
+    model = KINDS[kind][0]
+    columns = list(model.__table__.columns)
+    query = select(*columns)
+    if kind == 'shows' and names:
+        query = (select(*columns, Venue.name.label('venue_name'), Artist.name.label('artist_name'))
+                 .join(Venue, Venue.id == Show.venue_id).join(Artist, Artist.id == Show.artist_id))
+    if isinstance(since, datetime):
+        if kind != 'shows':
+            raise ValueError(f'{kind} have no timestamp, export them --since an id')
+        query = query.where(Show.start_time >= since)
+    elif since is not None:
+        query = query.where(model.id > since)
+    return query.order_by(model.id)
+
+
+def export_chunks(query, chunk_size):
+    """Yield ( column names, list of rows ) chunks read from a server-side cursor."""
+    with db.engine.connect() as connection:
+        result = connection.execution_options(stream_results=True).execute(query)
+        columns = list(result.keys())
+        for rows in result.partitions(chunk_size):
+            yield columns, rows
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
+    return value
+
+
+def encode_chunks(chunks, format):
+    """Yield the text of ``chunks`` in ``format``, a chunk at a time."""
+    header = True
+    for columns, rows in chunks:
+        if format == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if header:
+                writer.writerow(columns)
+                header = False
+            for row in rows:
+                writer.writerow([','.join(value) if isinstance(value, list) else _export_value(value)
+                                 for value in row])
+            yield buffer.getvalue()
+        elif format == 'jsonl':
+            yield ''.join(
+                json.dumps(dict(zip(columns, map(_export_value, row))), separators=(',', ':')) + '\n'
+                for row in rows)
+        else:
+            data = {column: [_export_value(row[i]) for row in rows] for i, column in enumerate(columns)}
+            yield json.dumps({'rows': len(rows), 'columns': data}, separators=(',', ':')) + '\n'
+
+
+@click.command('export')
+@with_appcontext
+@click.argument('kind', type=click.Choice(sorted(KINDS)))
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='Output file ( default: stdout ).')
+@click.option('--format', 'format', type=click.Choice(sorted(EXPORT_FORMATS)), default='csv', show_default=True)
+@click.option('--since', help='Only rows after this id, or shows starting at or after this timestamp.')
+@click.option('--names', is_flag=True, help='Add venue_name and artist_name to shows.')
+@click.option('--chunk-size', default=5000, show_default=True, help='Rows fetched per round trip.')
+def export_command(kind, output, format, since, names, chunk_size):
+    """Dump KIND ( venues, artists or shows ) as CSV, JSONL or columnar chunks."""
+    try:
+        query = export_query(kind, parse_since(since), names)
+    except (ValueError, OverflowError) as e:
+        raise click.BadParameter(str(e), param_hint='--since')
+
+    exported = 0
+    last_id = None
+
+    def counted(chunks):
+        nonlocal exported, last_id
+        for columns, rows in chunks:
+            exported += len(rows)
+            last_id = rows[-1][0]
+            yield columns, rows
+
+    started = time.perf_counter()
+    with click.open_file(output or '-', 'w', encoding='utf-8') as out:
+        for text in encode_chunks(counted(export_chunks(query, chunk_size)), format):
+            out.write(text)
+    elapsed = time.perf_counter() - started
+    click.echo(f'{exported} {kind} exported in {elapsed:.1f}s '
+               f'( {exported / elapsed if elapsed else 0:.0f} rows/s )', err=True)
+    if last_id is not None:
+        click.echo(f'next incremental export: --since {last_id}', err=True)
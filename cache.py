@@ -0,0 +1,190 @@
+"""Read-through cache for the venue and artist detail pages.
+
+``detail_cache`` keeps the ``data`` dict a detail page is rendered from,
+keyed by ``(kind, id)`` and the versions of the Venue, Artist and Show
+tables ( conditional.py ). A write anywhere, by any process or by ``flask
+import``, moves those versions on, so a page is never served from data
+older than its ETag.
+
+Backends implement :class:`CacheBackend`. :class:`LRUCache` lives in the
+process (bounded size, per entry TTL); with several workers a shared
+backend such as :class:`RedisCache` builds each page once for all of them.
+"""
+import pickle
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+
+from conditional import table_versions
+
+
+class CacheBackend(object):
+    """Interface every cache backend implements."""
+
+    def get(self, key):
+        """Return the value stored under ``key``, or None."""
+        raise NotImplementedError
+
+    def set(self, key, value, ttl):
+        """Store ``value`` under ``key`` for ``ttl`` seconds."""
+        raise NotImplementedError
+
+    def delete(self, *keys):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class NullCache(CacheBackend):
+    """Caches nothing; every read is a miss."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LRUCache(CacheBackend):
+    """In-process cache holding at most ``max_size`` entries, least recently used out first."""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by all workers, stored in Redis ( needs the ``redis`` package )."""
+
+    def __init__(self, url, prefix='fyyur:'):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def _key(self, key):
+        return self._prefix + ':'.join(str(part) for part in key)
+
+    def get(self, key):
+        raw = self._client.get(self._key(key))
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl):
+        self._client.set(self._key(key), pickle.dumps(value), ex=max(1, int(ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*[self._key(key) for key in keys])
+
+    def clear(self):
+        keys = list(self._client.scan_iter(self._prefix + '*'))
+        if keys:
+            self._client.delete(*keys)
+
+
+def make_backend(name, size, redis_url=None, prefix='fyyur:'):
+    """Build the backend called ``name`` ( 'lru', 'redis' or 'null' )."""
+    if name == 'lru':
+        return LRUCache(size)
+    if name == 'redis':
+        return RedisCache(redis_url, prefix)
+    if name in (None, 'null'):
+        return NullCache()
+    raise ValueError(f'Unknown cache backend {name!r}')
+
+
+class DetailCache(object):
+    """Read-through cache of detail page data with hit / miss counters."""
+
+    # the tables a detail page shows
+    TABLES = ('Venue', 'Artist', 'Show')
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.ttl = 0
+        self.hits = Counter()
+        self.misses = Counter()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = make_backend(app.config['DETAIL_CACHE_BACKEND'],
+                                    app.config['DETAIL_CACHE_SIZE'],
+                                    app.config['DETAIL_CACHE_REDIS_URL'])
+        self.ttl = app.config['DETAIL_CACHE_TTL']
+
+    def get_or_build(self, kind, id, build):
+        """Return the cached data for ``(kind, id)``, building it on a miss.
+
+        ``build(id)`` returns ``(data, expires_at)``; ``expires_at`` is the
+        datetime after which the data goes stale by itself ( e.g. when an
+        upcoming show starts ) or None. ``data`` None is not cached.
+        """
+        if isinstance(self.backend, NullCache):
+            return build(id)[0]
+        # the versions the ETag of the page ( conditional.py ) is made of, read once per request
+        versions = table_versions(self.TABLES)
+        key = (kind, id) + tuple(f'{table}.{version}.{changed_at.isoformat()}'
+                                 for table, (version, changed_at) in sorted(versions.items()))
+        data = self.backend.get(key)
+        if data is not None:
+            self.hits[kind] += 1
+            return data
+        self.misses[kind] += 1
+
+        data, expires_at = build(id)
+        if data is not None:
+            ttl = self.ttl
+            if expires_at is not None:
+                ttl = min(ttl, (expires_at - datetime.now()).total_seconds())
+            if ttl > 0:
+                self.backend.set(key, data, ttl)
+        return data
+
+    def stats(self):
+        return {
+            kind: {'hits': self.hits[kind], 'misses': self.misses[kind]}
+            for kind in set(self.hits) | set(self.misses)
+        }
+
+
+detail_cache = DetailCache()
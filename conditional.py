@@ -0,0 +1,156 @@
+"""Conditional GET ( ETag / Last-Modified ) for the read pages.
+
+Every flush that writes to Venue, Artist or Show bumps that table's row in
+"TableVersion". A page declares the tables it is built from with
+:func:`conditional`; its ETag hashes their versions ( one primary key
+lookup ), so a request carrying a matching ``If-None-Match`` or a recent
+enough ``If-Modified-Since`` gets a 304 before the view runs.
+
+Both validators also cover the deploy: the templates' modification times
+and the static asset manifest ( assets.py ) in use.
+
+Pages that split shows into past and upcoming also change when a show
+starts without anything being written; ``timed=True`` adds the start time
+of the latest show that has begun to their token.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import Response, current_app, g, has_request_context, make_response, request, session
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from assets import manifest_version
+from models import db, Show, TableVersion
+
+VERSIONED_TABLES = ('Venue', 'Artist', 'Show')
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def _insert_version_rows(target, connection, **kw):
+    now = datetime.utcnow()
+    connection.execute(target.insert(), [
+        {'table_name': name, 'version': 0, 'changed_at': now} for name in VERSIONED_TABLES
+    ])
+
+
+def bump_versions(connection, *tables):
+    """Record a change of ``tables``; for writes that bypass the ORM ( bulk loads )."""
+    if tables:
+        connection.execute(
+            TableVersion.__table__.update()
+            .where(TableVersion.table_name.in_(tables))
+            .values(version=TableVersion.version + 1, changed_at=datetime.utcnow())
+        )
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_flushed_tables(session, flush_context):
+    tables = set()
+    for obj in list(session.new) + list(session.deleted) + list(session.dirty):
+        table = getattr(obj, '__tablename__', None)
+        if table in VERSIONED_TABLES:
+            tables.add(table)
+    bump_versions(session.connection(), *sorted(tables))
+
+
+def _deploy_version():
+    """``(token, deployed_at)``: pages also change when their templates or asset URLs do."""
+    version = current_app.extensions.get('conditional_deploy_version')
+    if version is None:
+        mtimes = []
+        for root, dirs, files in os.walk(os.path.join(current_app.root_path, current_app.template_folder)):
+            mtimes.extend(os.path.getmtime(os.path.join(root, name)) for name in files)
+        token = repr(max(mtimes, default=0))
+        manifest = manifest_version(current_app)
+        if manifest is not None:
+            digest, mtime = manifest
+            token += f'|assets:{digest}'
+            mtimes.append(mtime)
+        deployed_at = datetime.utcfromtimestamp(max(mtimes, default=0))
+        version = current_app.extensions['conditional_deploy_version'] = (token, deployed_at)
+    return version
+
+
+def table_versions(tables, session=None):
+    """``{table: (version, changed_at)}`` of ``tables``, read once per request."""
+    known = g.setdefault('table_versions', {}) if has_request_context() else {}
+    missing = [table for table in tables if table not in known]
+    if missing:
+        rows = (session or db.session).query(TableVersion.table_name, TableVersion.version, TableVersion.changed_at
+            ).filter(TableVersion.table_name.in_(missing))
+        for row in rows:
+            known[row.table_name] = (row.version, row.changed_at)
+    return {table: known[table] for table in tables if table in known}
+
+
+def page_version(tables, timed=False):
+    """Return ``(etag, last_modified)`` of the current page.
+
+    ``last_modified`` is None for pages that do not show any table, and
+    while their last change is in the current second: HTTP dates have whole
+    seconds, so a later write in that same second would still satisfy the
+    ``If-Modified-Since`` of this response. It is rounded up otherwise.
+    """
+    deploy_token, deployed_at = _deploy_version()
+    parts = [request.endpoint, request.full_path, deploy_token]
+    changes = []
+    if tables:
+        changes.append(deployed_at)
+        for table, (version, changed_at) in sorted(table_versions(tables).items()):
+            parts.append(f'{table}:{version}')
+            changes.append(changed_at)
+    if timed:
+        now = datetime.now()
+        last_started = db.session.query(func.max(Show.start_time)).filter(Show.start_time <= now).scalar()
+        parts.append(f'started:{last_started}')
+        if last_started is not None:
+            # start times are local, Last-Modified is in UTC
+            changes.append(last_started + (datetime.utcnow() - now))
+    etag = hashlib.sha1('|'.join(parts).encode()).hexdigest()[:20]
+    last_modified = None
+    if changes:
+        last_change = max(changes)
+        last_modified = last_change.replace(microsecond=0)
+        if last_modified < last_change:
+            last_modified += timedelta(seconds=1)
+        if last_modified >= datetime.utcnow():
+            last_modified = None
+    return etag, last_modified
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return request.if_modified_since.replace(tzinfo=None) >= last_modified
+    return False
+
+
+def conditional(*tables, timed=False):
+    """Answer GETs of the decorated view with a 304 while ``tables`` are unchanged."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # flashed messages are rendered once, so those pages must be sent
+            if (not current_app.config['CONDITIONAL_GET'] or request.method != 'GET'
+                    or '_flashes' in session):
+                return view(*args, **kwargs)
+
+            etag, last_modified = page_version(tables, timed)
+            if _not_modified(etag, last_modified):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # always check back with us, the check is cheap
+            response.cache_control.no_cache = True
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,98 @@
+"""Memoized upcoming show counts of venues and artists.
+
+A count only changes when a show is added or removed, or when one of the
+entity's upcoming shows starts. So each count is cached under the version
+of the Show table ( conditional.py ), which every write of any process
+moves on, until the start time of the entity's next upcoming show
+( capped by UPCOMING_COUNTS_TTL ).
+"""
+from datetime import datetime
+
+from sqlalchemy import func
+
+from cache import NullCache, make_backend
+from conditional import table_versions
+from models import db, Show
+
+
+class UpcomingCounts(object):
+    """Number of upcoming shows per venue / artist, read through a cache."""
+
+    columns = {
+        'venue': Show.venue_id,
+        'artist': Show.artist_id,
+    }
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.ttl = 0
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = make_backend(app.config['UPCOMING_COUNTS_BACKEND'],
+                                    app.config['UPCOMING_COUNTS_SIZE'],
+                                    app.config['DETAIL_CACHE_REDIS_URL'],
+                                    prefix='fyyur:upcoming:')
+        self.ttl = app.config['UPCOMING_COUNTS_TTL']
+
+    def get_many(self, kind, ids, session=None):
+        """Return ``{id: upcoming show count}`` for ``ids``.
+
+        Cached counts are served as is; the others are computed together
+        with one grouped query on ``session`` ( default ``db.session`` ).
+        """
+        if isinstance(self.backend, NullCache):
+            return self._count(kind, ids, session)
+        # the Show version of the page's ETag, read once per request
+        version, changed_at = table_versions(['Show'], session)['Show']
+        shows = f'{version}.{changed_at.isoformat()}'
+        counts = {}
+        missing = []
+        for id in ids:
+            count = self.backend.get((kind, id, shows))
+            if count is None:
+                missing.append(id)
+            else:
+                counts[id] = count
+        self.hits += len(counts)
+        self.misses += len(missing)
+        if not missing:
+            return counts
+
+        current_time = datetime.now()
+        computed = self._query(kind, missing, session, current_time)
+        for id in missing:
+            result = computed.get(id)
+            count = result.count if result else 0
+            ttl = self.ttl
+            if result is not None:
+                # the count drops by one when the next upcoming show starts
+                ttl = min(ttl, (result.next_start - current_time).total_seconds())
+            if ttl > 0:
+                self.backend.set((kind, id, shows), count, ttl)
+            counts[id] = count
+        return counts
+
+    def _count(self, kind, ids, session=None):
+        computed = self._query(kind, ids, session, datetime.now())
+        return {id: computed[id].count if id in computed else 0 for id in ids}
+
+    def _query(self, kind, ids, session, current_time):
+        """``{id: ( id, count, next_start )}`` of the ids with upcoming shows, one grouped query."""
+        column = self.columns[kind]
+        results = (session or db.session).query(
+            column.label('id'),
+            func.count(Show.id).label('count'),
+            func.min(Show.start_time).label('next_start'),
+        ).filter(column.in_(ids), Show.start_time > current_time
+        ).group_by(column).all()
+        return {result.id: result for result in results}
+
+    def get(self, kind, id):
+        return self.get_many(kind, [id])[id]
+
+
+upcoming_counts = UpcomingCounts()
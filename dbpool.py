@@ -0,0 +1,145 @@
+"""Connection pool settings, fork safety and pool statistics.
+
+``init_app`` turns the ``DB_*`` settings of config.py into
+``SQLALCHEMY_ENGINE_OPTIONS`` for the configured database: Postgres gets a
+``TimedQueuePool`` of the configured size; SQLite keeps SQLAlchemy's own
+pool, which has nothing to size. Settings already present in
+``SQLALCHEMY_ENGINE_OPTIONS`` win over the ``DB_*`` ones.
+
+``DB_STATEMENT_TIMEOUT`` only limits web requests: each transaction the
+session begins inside a request starts with ``SET LOCAL
+statement_timeout``, which ends with the transaction. Migrations and the
+CLI commands ( ``flask import``, ``flask export`` ) share the engine but
+run without a limit.
+
+Connections opened before a fork ( gunicorn ``--preload`` ) are never
+shared with the child: a connection checked out by another process than
+the one that opened it is discarded and replaced.
+"""
+import os
+import threading
+import time
+
+from flask import current_app, has_request_context
+from sqlalchemy import event, exc
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool, QueuePool
+
+from models import db
+
+
+class PoolStats(object):
+    """Checkouts of this process and the time spent waiting for them."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool timing how long a checkout waits for a free connection."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - started)
+        return connection
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the database of ``config``."""
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    return {
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+    }
+
+
+@event.listens_for(Session, 'after_begin')
+def _limit_request_statements(session, transaction, connection):
+    if not has_request_context() or connection.dialect.name != 'postgresql':
+        return
+    timeout = current_app.config.get('DB_STATEMENT_TIMEOUT')
+    if timeout:
+        # on the DBAPI cursor: a setting of the transaction, not a query of the view
+        cursor = connection.connection.cursor()
+        try:
+            cursor.execute(f'SET LOCAL statement_timeout = {int(timeout)}')
+        finally:
+            cursor.close()
+
+
+def init_app(app):
+    options = engine_options(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def pool_status():
+    """Size and use of the pool of this process, with the checkout wait times."""
+    pool = db.engine.pool
+    status = {'class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+        )
+    with pool_stats.lock:
+        status.update(
+            checkouts=pool_stats.checkouts,
+            timeouts=pool_stats.timeouts,
+            wait_seconds_total=round(pool_stats.wait_total, 6),
+            wait_seconds_max=round(pool_stats.wait_max, 6),
+        )
+    return status
+
+
+# ---------------------------------------------------------------------------#
+# Fork safety.
+# ---------------------------------------------------------------------------#
+
+@event.listens_for(Pool, 'connect')
+def _remember_pid(dbapi_connection, connection_record):
+    connection_record.info['pid'] = os.getpid()
+
+
+@event.listens_for(Pool, 'checkout')
+def _check_pid(dbapi_connection, connection_record, connection_proxy):
+    if connection_record.info.get('pid') != os.getpid():
+        # inherited from the parent: drop it without closing the parent's socket
+        connection_record.connection = connection_proxy.connection = None
+        raise exc.DisconnectionError(
+            f"connection opened by process {connection_record.info.get('pid')}, checked out by {os.getpid()}")
+
+
+os.register_at_fork(after_in_child=pool_stats.reset)
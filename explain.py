@@ -0,0 +1,89 @@
+"""``flask explain-queries``: check that the hot queries use the Show indexes.
+
+The command requests the read pages through the test client, records the
+SELECTs they send that touch "Show", and prints the plan of each one. It
+exits with status 1 if any of them reads "Show" with a sequential scan
+(or, on SQLite, through a throwaway automatic index).
+On Postgres sequential scans are disabled for the EXPLAIN, so the answer
+does not depend on how much data the database happens to hold.
+"""
+import re
+import sys
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event
+
+from models import db, Venue, Artist
+
+SEQUENTIAL_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on "?Show"?'),
+    # an automatic index is built by scanning the whole table first
+    'sqlite': re.compile(r'\bSCAN "?Show"?(?! USING)|\bSEARCH "?Show"? USING AUTOMATIC'),
+}
+
+
+def hot_requests():
+    """The (method, url, form) requests whose queries are checked."""
+    venue_id = db.session.query(Venue.id).order_by(Venue.id).limit(1).scalar() or 1
+    artist_id = db.session.query(Artist.id).order_by(Artist.id).limit(1).scalar() or 1
+    return [
+        ('GET', '/venues', None),
+        ('GET', '/artists', None),
+        ('GET', '/shows', None),
+        ('GET', f'/venues/{venue_id}', None),
+        ('GET', f'/artists/{artist_id}', None),
+        ('POST', '/venues/search', {'search_term': 'the'}),
+        ('POST', '/artists/search', {'search_term': 'the'}),
+    ]
+
+
+def capture_statements(requests):
+    """Run ``requests`` and return the (url, statement, parameters) they sent for "Show"."""
+    captured = []
+    current = {}
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and '"Show"' in statement:
+            captured.append((current['url'], statement, parameters))
+
+    client = current_app.test_client()
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for method, url, form in requests:
+            current['url'] = url
+            client.open(url, method=method, data=form)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+    return captured
+
+
+def explain(statement, parameters):
+    dialect = db.engine.dialect.name
+    with db.engine.connect() as conn:
+        if dialect == 'postgresql':
+            with conn.begin():
+                conn.exec_driver_sql('SET LOCAL enable_seqscan = off')
+                rows = conn.exec_driver_sql('EXPLAIN ' + statement, parameters).fetchall()
+            return [row[0] for row in rows]
+        rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        return [row[-1] for row in rows]
+
+
+@click.command('explain-queries')
+@with_appcontext
+def explain_queries_command():
+    """Print the plans of the hot queries and fail on sequential scans of Show."""
+    pattern = SEQUENTIAL_SCAN.get(db.engine.dialect.name)
+    failures = 0
+    for url, statement, parameters in capture_statements(hot_requests()):
+        plan = explain(statement, parameters)
+        scans = [line for line in plan if pattern and pattern.search(line)]
+        failures += bool(scans)
+        click.echo(f"{'SEQ SCAN' if scans else 'ok':8} {url}")
+        for line in plan:
+            click.echo(f'    {line}')
+    if failures:
+        click.echo(f'{failures} queries read "Show" sequentially', err=True)
+        sys.exit(1)
@@ -1,7 +1,8 @@
 from datetime import datetime
 from flask_wtf import FlaskForm as Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, NumberRange, Optional
+from models import DEFAULT_SHOW_DURATION, MAX_SHOW_DURATION
 
 genres_choices=[
             ('Alternative', 'Alternative'),
@@ -90,6 +91,12 @@ class ShowForm(Form):
         validators=[DataRequired()],
         default= datetime.today()
     )
+    # minutes
+    duration = IntegerField(
+        'duration',
+        validators=[Optional(), NumberRange(min=1, max=MAX_SHOW_DURATION)],
+        default=DEFAULT_SHOW_DURATION
+    )
 
 class VenueForm(Form):
     name = StringField(
@@ -0,0 +1,139 @@
+"""Genre filtering and facet counts for the listings and searches.
+
+Genres stay an array column ( see ``StringArray`` in models.py ). On
+Postgres ``?genre=`` becomes ``genres @> ARRAY[...]``, which the GIN
+indexes on the genre columns answer. Local SQLite databases store the
+array as JSON and test membership through ``json_each``, unindexed.
+
+Facet counts unnest the genres of every row of the current result set
+( the listing or search with its genre filters applied, as a subquery )
+and count them in one grouped query. That aggregate reads the whole result
+set, so :data:`genre_facets` memoizes it per table version ( "TableVersion",
+see conditional.py ): it is computed again only after the table was
+written to. Pages under ``@conditional`` have read the version already.
+"""
+from collections import namedtuple
+
+from flask import request
+from sqlalchemy import String, cast, func, select, true
+from sqlalchemy.dialects import postgresql
+
+from cache import NullCache, make_backend
+from conditional import table_versions
+from models import db
+
+Facet = namedtuple('Facet', ['genre', 'count'])
+
+
+def requested_genres():
+    """The ``genre`` values of the query string ( or search form ), deduplicated."""
+    genres = []
+    for genre in request.values.getlist('genre'):
+        genre = genre.strip()
+        if genre and genre not in genres:
+            genres.append(genre)
+    return genres
+
+
+def _dialect(session):
+    return (session or db.session).get_bind().dialect.name
+
+
+def _elements(genres, dialect):
+    """The array column ``genres`` as a table valued function, and its value column."""
+    if dialect == 'postgresql':
+        elements = func.unnest(genres).table_valued('genre')
+        return elements, elements.c.genre
+    elements = func.json_each(genres).table_valued('value')
+    return elements, elements.c.value
+
+
+def genre_filter(model, genres, session=None):
+    """Criteria that keep the rows of ``model`` tagged with all of ``genres``."""
+    if not genres:
+        return []
+    dialect = _dialect(session)
+    if dialect == 'postgresql':
+        wanted = cast(postgresql.array(list(genres)), postgresql.ARRAY(String))
+        return [model.genres.op('@>')(wanted)]
+    criteria = []
+    for genre in genres:
+        elements, value = _elements(model.genres, dialect)
+        criteria.append(select(value).where(value == genre).exists())
+    return criteria
+
+
+def filter_genres(query, model, genres, session=None):
+    return query.filter(*genre_filter(model, genres, session))
+
+
+def count_facets(query, model, selected=(), session=None):
+    """Return a :class:`Facet` per genre of the rows of ``query``, most frequent first.
+
+    ``query`` is the filtered result set without its limit, as a query on
+    ``model``. Genres in ``selected`` that no row has are listed with a
+    count of 0, so they can still be unselected.
+    """
+    session = session or db.session
+    rows = query.with_entities(model.genres.label('genres')).order_by(None).subquery()
+    elements, genre = _elements(rows.c.genres, _dialect(session))
+    count = func.count().label('count')
+    results = session.query(genre.label('genre'), count
+        ).select_from(rows
+        ).join(elements, true()
+        ).group_by(genre
+        ).order_by(count.desc(), genre
+        ).all()
+    facets = [Facet(result.genre, result.count) for result in results]
+    found = {facet.genre for facet in facets}
+    facets.extend(Facet(genre, 0) for genre in selected if genre not in found)
+    return facets
+
+
+class GenreFacets(object):
+    """Facet counts read through a cache, keyed by the version of the table they count."""
+
+    def __init__(self, app=None):
+        self.backend = NullCache()
+        self.ttl = 0
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = make_backend(app.config['GENRE_FACETS_BACKEND'],
+                                    app.config['GENRE_FACETS_SIZE'],
+                                    app.config['DETAIL_CACHE_REDIS_URL'],
+                                    prefix='fyyur:facets:')
+        self.ttl = app.config['GENRE_FACETS_TTL']
+
+    def get(self, query, model, selected=(), session=None, term=None):
+        """:func:`count_facets` of ``query``, memoized.
+
+        ``query`` has to be the rows of ``model`` with all of ``selected``
+        ( and matching the search ``term`` ): those, with the version of the
+        table, are the cache key.
+        """
+        if isinstance(self.backend, NullCache):
+            return count_facets(query, model, selected, session)
+        table = model.__tablename__
+        version, changed_at = table_versions([table], session)[table]
+        # changed_at too: versions start over when the table is created again
+        key = (table, version, changed_at.isoformat(), tuple(selected), term)
+        facets = self.backend.get(key)
+        if facets is not None:
+            self.hits += 1
+            return facets
+        self.misses += 1
+        facets = count_facets(query, model, selected, session)
+        self.backend.set(key, facets, self.ttl)
+        return facets
+
+
+genre_facets = GenreFacets()
+
+
+def facet_counts(query, model, selected=(), session=None, term=None):
+    """The memoized :func:`count_facets` ( see :meth:`GenreFacets.get` )."""
+    return genre_facets.get(query, model, selected, session, term)
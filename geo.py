@@ -0,0 +1,169 @@
+"""Venue coordinates and the ``/venues/near`` radius search.
+
+Venues are placed at the centre of their city, or of their state when the
+city is not in the bundled table ( centroids.py ); nothing is geocoded
+over the network. Besides its latitude and longitude a venue stores the
+number of the GEO_CELL_DEGREES square of the latitude / longitude grid it
+lies in, indexed together with its coordinates.
+
+A radius search turns the bounding box of its circle into one range of
+cell numbers per grid row ( a handful of index range scans ) and counts
+the venues inside the box per point, from the index alone. The exact
+great circle distance of each point is computed in Python; a second
+query then fetches the venues of the closest points. Its cost follows
+the number of distinct places near the point, not the size of the table.
+"""
+import math
+from collections import namedtuple
+
+from flask import abort, current_app, request
+from sqlalchemy import and_, case, event, func, inspect, or_
+
+from centroids import CITY_CENTROIDS, STATE_CENTROIDS
+from models import db, Venue
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = math.pi * EARTH_RADIUS_MILES / 180
+GEO_CELL_DEGREES = 0.5
+GRID_COLUMNS = int(360 / GEO_CELL_DEGREES)
+
+Nearby = namedtuple('Nearby', ['id', 'name', 'city', 'state', 'distance'])
+
+
+def place_key(city):
+    """``city`` as spelled in CITY_CENTROIDS: lower case, no dots, "st" for "saint"."""
+    words = (city or '').replace('.', ' ').casefold().split()
+    if words and words[0] == 'saint':
+        words[0] = 'st'
+    return ' '.join(words)
+
+
+def locate(city, state):
+    """``( latitude, longitude )`` of a city, its state's centre, or ``( None, None )``."""
+    state = (state or '').strip().upper()
+    return CITY_CENTROIDS.get((place_key(city), state)) or STATE_CENTROIDS.get(state) or (None, None)
+
+
+def geo_cell(latitude, longitude):
+    row = int((latitude + 90) // GEO_CELL_DEGREES)
+    column = min(int((longitude + 180) // GEO_CELL_DEGREES), GRID_COLUMNS - 1)
+    return row * GRID_COLUMNS + column
+
+
+def coordinates(city, state):
+    """The ``latitude``, ``longitude`` and ``geo_cell`` column values of a venue."""
+    latitude, longitude = locate(city, state)
+    cell = geo_cell(latitude, longitude) if latitude is not None else None
+    return {'latitude': latitude, 'longitude': longitude, 'geo_cell': cell}
+
+
+@event.listens_for(Venue, 'before_insert')
+@event.listens_for(Venue, 'before_update')
+def _place_venue(mapper, connection, venue):
+    state = inspect(venue)
+    moved = state.attrs.city.history.has_changes() or state.attrs.state.history.has_changes()
+    if moved or venue.geo_cell is None:
+        for column, value in coordinates(venue.city, venue.state).items():
+            setattr(venue, column, value)
+
+
+def distance(latitude, longitude, other_latitude, other_longitude):
+    """Great circle distance in miles ( haversine )."""
+    lat1, lat2 = math.radians(latitude), math.radians(other_latitude)
+    half_dlat = (lat2 - lat1) / 2
+    half_dlng = math.radians(other_longitude - longitude) / 2
+    a = math.sin(half_dlat) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin(half_dlng) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius):
+    """``( south, north, west, east )`` of the circle, clipped to the valid ranges."""
+    dlat = radius / MILES_PER_DEGREE
+    south, north = max(-90.0, latitude - dlat), min(90.0, latitude + dlat)
+    # the widest point of the circle is on its poleward edge
+    widest = max(abs(south), abs(north))
+    if widest >= 90.0:
+        return south, north, -180.0, 180.0
+    dlng = min(180.0, dlat / math.cos(math.radians(widest)))
+    return south, north, max(-180.0, longitude - dlng), min(180.0, longitude + dlng)
+
+
+def cell_ranges(south, north, west, east):
+    """``[( first, last )]`` cell numbers covering the box, one range per grid row."""
+    first_row, last_row = geo_cell(south, west) // GRID_COLUMNS, geo_cell(north, west) // GRID_COLUMNS
+    first_column = geo_cell(south, west) % GRID_COLUMNS
+    last_column = geo_cell(south, east) % GRID_COLUMNS
+    return [(row * GRID_COLUMNS + first_column, row * GRID_COLUMNS + last_column)
+            for row in range(first_row, last_row + 1)]
+
+
+def nearby(latitude, longitude, radius, limit, session=None):
+    """Return ``(count, venues)``: the :class:`Nearby` venues within ``radius`` miles, closest first.
+
+    ``count`` is the number of venues in the circle, ``venues`` the ``limit``
+    closest ( ties by name ).
+    """
+    session = session or db.session
+    south, north, west, east = bounding_box(latitude, longitude, radius)
+    # venues share the centre of their city: count them per point, from the index alone
+    points = session.query(Venue.latitude, Venue.longitude, func.count().label('venues')).filter(
+        or_(*[Venue.geo_cell.between(first, last) for first, last in cell_ranges(south, north, west, east)]),
+        Venue.latitude.between(south, north),
+        Venue.longitude.between(west, east),
+    ).group_by(Venue.latitude, Venue.longitude).all()
+    inside = sorted(
+        (miles, point.latitude, point.longitude, point.venues)
+        for miles, point in ((distance(latitude, longitude, point.latitude, point.longitude), point)
+                             for point in points)
+        if miles <= radius
+    )
+    count = sum(venues for miles, lat, lng, venues in inside)
+
+    # then the venues of the closest points, up to ``limit`` of them
+    closest = []
+    held = 0
+    for miles, lat, lng, venues in inside:
+        if held >= limit and miles > closest[-1][0]:
+            break
+        closest.append((miles, lat, lng))
+        held += venues
+    if not closest:
+        return count, []
+    at_point = [and_(Venue.geo_cell == geo_cell(lat, lng), Venue.latitude == lat, Venue.longitude == lng)
+                for miles, lat, lng in closest]
+    miles = case(*[(condition, point[0]) for condition, point in zip(at_point, closest)])
+    venues = session.query(Venue.id, Venue.name, Venue.city, Venue.state, miles.label('distance')
+        ).filter(or_(*at_point)
+        ).order_by(miles, Venue.name, Venue.id
+        ).limit(limit).all()
+    return count, [Nearby(venue.id, venue.name, venue.city, venue.state, round(venue.distance, 1))
+                   for venue in venues]
+
+
+def near_args():
+    """The origin and radius asked for in the query string.
+
+    Returns ``(latitude, longitude, radius, place)``; ``place`` is the
+    ``"city, state"`` the origin was looked up from ( None for ``lat`` /
+    ``lng`` ), and the coordinates are None when no origin was given or the
+    place is unknown. Malformed numbers abort with a 400.
+    """
+    config = current_app.config
+    radius = request.args.get('radius', config['NEAR_RADIUS_MILES'], type=float)
+    if not 0 < radius <= config['NEAR_MAX_RADIUS_MILES']:
+        abort(400, f"radius must be between 0 and {config['NEAR_MAX_RADIUS_MILES']} miles")
+    if 'lat' in request.args or 'lng' in request.args:
+        latitude = request.args.get('lat', type=float)
+        longitude = request.args.get('lng', type=float)
+        if latitude is None or longitude is None or not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            abort(400, 'lat and lng must be a latitude and a longitude in degrees')
+        return latitude, longitude, radius, None
+    city, state = request.args.get('city', '').strip(), request.args.get('state', '').strip()
+    if not city and not state:
+        return None, None, radius, None
+    if city:
+        # a city missing from the table is unknown here, not its state's centre
+        latitude, longitude = CITY_CENTROIDS.get((place_key(city), state.upper()), (None, None))
+    else:
+        latitude, longitude = STATE_CENTROIDS.get(state.upper(), (None, None))
+    return latitude, longitude, radius, ', '.join(part for part in (city, state.upper()) if part)
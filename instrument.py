@@ -0,0 +1,158 @@
+"""Per-request query count, database time and template render time.
+
+Engine events time every statement, a Jinja template class times
+rendering, and Flask request hooks add the sums up per request. They are
+sent back in a ``Server-Timing`` header and requests crossing
+``SLOW_REQUEST_MS``, ``SLOW_REQUEST_QUERIES`` or the query budget of their
+view ( budget.py ) are written to ``SLOW_REQUEST_LOG`` ( in the instance
+folder unless absolute ) together with their slowest statement. Time spent
+fetching rows while a template renders counts as database time only.
+
+The counters are a few ``perf_counter`` calls and additions per statement,
+so they can stay on in production. Statements run outside of a request
+( CLI commands ) are not counted.
+"""
+import logging
+import os
+import time
+
+from flask import g, has_request_context, request
+from jinja2 import Template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from budget import view_budget
+
+slow_log = logging.getLogger('fyyur.slow')
+
+# characters of the slowest statement written to the slow request log
+STATEMENT_LOG_LENGTH = 300
+
+
+class RequestTiming(object):
+    __slots__ = ('started', 'queries', 'db_time', 'render_time', 'slowest', 'slowest_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.slowest = None
+        self.slowest_time = 0.0
+
+    def add_query(self, statement, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        if elapsed > self.slowest_time:
+            self.slowest, self.slowest_time = statement, elapsed
+
+    def add_render(self, elapsed, db_time):
+        # rows fetched lazily while rendering ( streamed pages ) are already database time
+        self.render_time += max(0.0, elapsed - db_time)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        return (f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries", '
+                f'render;dur={self.render_time * 1000:.1f}, '
+                f'total;dur={self.elapsed() * 1000:.1f}')
+
+
+def current_timing():
+    return g.get('timing') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timing = current_timing()
+    if timing is not None:
+        timing.add_query(statement, time.perf_counter() - context._query_started)
+
+
+class TimedTemplate(Template):
+    """Adds the time spent rendering to the timing of the current request."""
+
+    def render(self, *args, **kwargs):
+        timing = current_timing()
+        if timing is None:
+            return super().render(*args, **kwargs)
+        started, db_time = time.perf_counter(), timing.db_time
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            timing.add_render(time.perf_counter() - started, timing.db_time - db_time)
+
+    def generate(self, *args, **kwargs):
+        # streamed pages: only the template's own work, between the chunks and
+        # without the fetches of the rows it iterates
+        chunks = super().generate(*args, **kwargs)
+        while True:
+            timing = current_timing()
+            started, db_time = time.perf_counter(), timing.db_time if timing is not None else 0.0
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                return
+            finally:
+                if timing is not None:
+                    timing.add_render(time.perf_counter() - started, timing.db_time - db_time)
+            yield chunk
+
+
+def slow_log_path(app):
+    """SLOW_REQUEST_LOG, relative paths taken from the instance folder."""
+    path = os.path.join(app.instance_path, app.config['SLOW_REQUEST_LOG'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
+def init_app(app):
+    if not app.config['INSTRUMENT_REQUESTS']:
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.jinja_env.template_class = TimedTemplate
+
+    if app.config['SLOW_REQUEST_LOG'] and not slow_log.handlers:
+        handler = logging.FileHandler(slow_log_path(app))
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_log.addHandler(handler)
+        slow_log.setLevel(logging.INFO)
+        slow_log.propagate = False
+
+    @app.before_request
+    def start_timing():
+        g.timing = RequestTiming()
+
+    @app.after_request
+    def send_timing(response):
+        timing = g.get('timing')
+        if timing is None:
+            return response
+        if app.config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = timing.server_timing()
+        description = f'{request.method} {request.full_path.rstrip("?")}'
+        slow_ms = app.config['SLOW_REQUEST_MS']
+        slow_queries = app.config['SLOW_REQUEST_QUERIES']
+        budget = view_budget(app.view_functions.get(request.endpoint))
+        if budget is not None:
+            slow_queries = min(slow_queries, budget + 1)
+
+        # logged once the body is sent, so streamed pages count in full
+        def log_if_slow():
+            elapsed = timing.elapsed() * 1000
+            if elapsed >= slow_ms or timing.queries >= slow_queries:
+                slowest = ' '.join((timing.slowest or '').split())[:STATEMENT_LOG_LENGTH]
+                slow_log.info(
+                    f'{description} {response.status_code} total={elapsed:.1f}ms '
+                    f'db={timing.db_time * 1000:.1f}ms queries={timing.queries} '
+                    f'render={timing.render_time * 1000:.1f}ms '
+                    f'slowest={timing.slowest_time * 1000:.1f}ms "{slowest}"')
+
+        response.call_on_close(log_if_slow)
+        return response
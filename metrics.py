@@ -0,0 +1,150 @@
+"""Prometheus metrics on ``/metrics``.
+
+Per endpoint request counters and latency histograms, statement and
+per-request query histograms ( the latter with INSTRUMENT_REQUESTS ), cache
+hit / miss counters, connection pool gauges and the autocomplete index size.
+
+Under gunicorn every worker has its own counters. Start it with
+``PROMETHEUS_MULTIPROC_DIR`` pointing at an empty directory ( it must be
+set before prometheus_client is imported ): the workers then write their
+samples to mmap files there and ``/metrics`` adds up the files of all of
+them, whichever worker answers the scrape. The gunicorn config should also
+call ``prometheus_client.multiprocess.mark_process_dead(worker.pid)`` from
+its ``child_exit`` hook.
+
+Hit ratios are left to the queries, e.g.
+``rate(fyyur_cache_hits_total[5m]) / (rate(fyyur_cache_hits_total[5m]) + rate(fyyur_cache_misses_total[5m]))``.
+"""
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from autocomplete import autocomplete
+from budget import query_budget
+from cache import detail_cache
+from counts import upcoming_counts
+from genres import genre_facets
+from dbpool import pool_status
+
+REQUESTS = Counter('fyyur_requests_total', 'HTTP requests', ['endpoint', 'method', 'status'])
+REQUEST_LATENCY = Histogram('fyyur_request_duration_seconds', 'Time to send the whole response',
+                            ['endpoint', 'method'])
+REQUEST_QUERIES = Histogram('fyyur_request_queries', 'SQL statements per request', ['endpoint'],
+                            buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89))
+QUERY_LATENCY = Histogram('fyyur_db_query_duration_seconds', 'SQL statement execution time',
+                          buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+
+CACHE_HITS = Counter('fyyur_cache_hits_total', 'Cache hits', ['cache'])
+CACHE_MISSES = Counter('fyyur_cache_misses_total', 'Cache misses', ['cache'])
+
+POOL_CHECKED_OUT = Gauge('fyyur_db_pool_checked_out', 'Connections in use', multiprocess_mode='livesum')
+POOL_IDLE = Gauge('fyyur_db_pool_idle', 'Connections open and free', multiprocess_mode='livesum')
+POOL_OVERFLOW = Gauge('fyyur_db_pool_overflow', 'Connections open beyond the pool size',
+                      multiprocess_mode='livesum')
+POOL_CHECKOUTS = Counter('fyyur_db_pool_checkouts_total', 'Connection checkouts')
+POOL_TIMEOUTS = Counter('fyyur_db_pool_timeouts_total', 'Checkouts that timed out waiting')
+POOL_WAIT = Counter('fyyur_db_pool_wait_seconds_total', 'Time spent waiting for a connection')
+
+AUTOCOMPLETE_BYTES = Gauge('fyyur_autocomplete_index_bytes', 'Memory used by the autocomplete index',
+                           multiprocess_mode='livesum')
+
+# the cache and pool counters of this process, as last copied to the metrics
+_copied = {}
+
+
+def _copy(counter, key, value):
+    """Add the growth of the in-process counter ``key`` since the last copy."""
+    last = _copied.get(key, 0)
+    if value > last:
+        counter.inc(value - last)
+    _copied[key] = value
+
+
+def copy_stats():
+    for kind, stats in detail_cache.stats().items():
+        _copy(CACHE_HITS.labels(cache=f'detail_{kind}'), ('detail', kind, 'hits'), stats['hits'])
+        _copy(CACHE_MISSES.labels(cache=f'detail_{kind}'), ('detail', kind, 'misses'), stats['misses'])
+    _copy(CACHE_HITS.labels(cache='upcoming_counts'), ('upcoming', 'hits'), upcoming_counts.hits)
+    _copy(CACHE_MISSES.labels(cache='upcoming_counts'), ('upcoming', 'misses'), upcoming_counts.misses)
+    _copy(CACHE_HITS.labels(cache='genre_facets'), ('facets', 'hits'), genre_facets.hits)
+    _copy(CACHE_MISSES.labels(cache='genre_facets'), ('facets', 'misses'), genre_facets.misses)
+
+    status = pool_status()
+    if 'checked_out' in status:
+        POOL_CHECKED_OUT.set(status['checked_out'])
+        POOL_IDLE.set(status['idle'])
+        POOL_OVERFLOW.set(status['overflow'])
+    _copy(POOL_CHECKOUTS, 'checkouts', status['checkouts'])
+    _copy(POOL_TIMEOUTS, 'timeouts', status['timeouts'])
+    _copy(POOL_WAIT, 'wait', status['wait_seconds_total'])
+    AUTOCOMPLETE_BYTES.set(autocomplete.stats()['bytes'])
+
+
+def _reset_pool_copied():
+    # a forked worker keeps the cache counters it inherited, already copied
+    # by the parent, but starts its pool statistics from zero ( see dbpool )
+    for key in ('checkouts', 'timeouts', 'wait'):
+        _copied.pop(key, None)
+
+
+os.register_at_fork(after_in_child=_reset_pool_copied)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    QUERY_LATENCY.observe(time.perf_counter() - context._metrics_started)
+
+
+def registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        collected = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collected)
+        return collected
+    return REGISTRY
+
+
+def init_app(app):
+    if not app.config['METRICS_ENABLED']:
+        return
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('metrics_started')
+        if started is None or request.endpoint == 'metrics':
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        method = request.method
+        status = response.status_code
+        timing = g.get('timing')
+
+        # observed once the body is sent, so streamed pages count in full
+        def observe():
+            REQUESTS.labels(endpoint, method, status).inc()
+            REQUEST_LATENCY.labels(endpoint, method).observe(time.perf_counter() - started)
+            if timing is not None:
+                REQUEST_QUERIES.labels(endpoint).observe(timing.queries)
+
+        response.call_on_close(observe)
+        copy_stats()
+        return response
+
+    @app.route('/metrics')
+    @query_budget(0)
+    def metrics():
+        copy_stats()
+        return Response(generate_latest(registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,68 @@
+"""add genre indexes
+
+Cleans up the stored genre lists first, so that the ?genre= filters and
+facet counts ( genres.py ) see one exact spelling per genre: values are
+stripped, empty and repeated ones dropped, and lists nested by the old
+artist edit handler flattened.
+
+Revision ID: 3d9b6a2e5f14
+Revises: e2f08a4c71d3
+Create Date: 2026-10-18 15:02:17.338610
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3d9b6a2e5f14'
+down_revision = 'e2f08a4c71d3'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def _flatten(values):
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            yield from _flatten(value)
+        elif value is not None:
+            yield str(value)
+
+
+def normalize(genres):
+    normalized = []
+    for genre in _flatten(genres or []):
+        genre = genre.strip()
+        if genre and genre not in normalized:
+            normalized.append(genre)
+    return normalized
+
+
+def _normalize_genres(connection):
+    # ARRAY on Postgres, a JSON encoded list elsewhere ( models.StringArray )
+    genres_type = postgresql.ARRAY(sa.String()) if connection.dialect.name == 'postgresql' else sa.JSON()
+    for name in TABLES:
+        entities = sa.table(name, sa.column('id', sa.Integer()), sa.column('genres', genres_type))
+        changed = []
+        for id, genres in connection.execute(sa.select(entities.c.id, entities.c.genres)):
+            if genres is not None and normalize(genres) != genres:
+                changed.append({'entity_id': id, 'new_genres': normalize(genres)})
+        if changed:
+            connection.execute(
+                entities.update().where(entities.c.id == sa.bindparam('entity_id'))
+                .values(genres=sa.bindparam('new_genres', type_=genres_type)),
+                changed)
+
+
+def upgrade():
+    _normalize_genres(op.get_bind())
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False, postgresql_using='gin')
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
@@ -0,0 +1,205 @@
+"""add venue coordinates
+
+Places the existing venues at the centre of their city or state. The
+tables and the grid are copied from centroids.py and geo.py as they were
+when this revision was written, so it replays whatever those become.
+
+Revision ID: 8a1f4c7d2e63
+Revises: 3d9b6a2e5f14
+Create Date: 2026-10-18 16:27:44.915307
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a1f4c7d2e63'
+down_revision = '3d9b6a2e5f14'
+branch_labels = None
+depends_on = None
+
+
+GEO_CELL_DEGREES = 0.5
+GRID_COLUMNS = int(360 / GEO_CELL_DEGREES)
+
+STATE_CENTROIDS = {
+    'AL': (32.79, -86.83), 'AK': (64.20, -149.49), 'AZ': (34.29, -111.66), 'AR': (34.90, -92.44),
+    'CA': (37.18, -119.47), 'CO': (38.99, -105.55), 'CT': (41.62, -72.73), 'DE': (38.99, -75.51),
+    'DC': (38.90, -77.02), 'FL': (28.63, -82.45), 'GA': (32.68, -83.22), 'HI': (20.29, -156.37),
+    'ID': (44.35, -114.61), 'IL': (40.04, -89.20), 'IN': (39.89, -86.28), 'IA': (42.08, -93.50),
+    'KS': (38.49, -98.38), 'KY': (37.53, -85.30), 'LA': (31.07, -91.99), 'ME': (45.37, -69.24),
+    'MT': (47.05, -109.63), 'NE': (41.54, -99.80), 'NV': (39.33, -116.63), 'NH': (43.68, -71.58),
+    'NJ': (40.19, -74.67), 'NM': (34.41, -106.11), 'NY': (42.95, -75.53), 'NC': (35.56, -79.39),
+    'ND': (47.45, -100.47), 'OH': (40.29, -82.79), 'OK': (35.59, -97.49), 'OR': (43.93, -120.56),
+    'MD': (39.05, -76.79), 'MA': (42.26, -71.81), 'MI': (44.35, -85.41), 'MN': (46.28, -94.31),
+    'MS': (32.74, -89.67), 'MO': (38.36, -92.46), 'PA': (40.90, -77.84), 'RI': (41.68, -71.56),
+    'SC': (33.92, -80.90), 'SD': (44.44, -100.23), 'TN': (35.86, -86.35), 'TX': (31.48, -99.33),
+    'UT': (39.31, -111.67), 'VT': (44.07, -72.67), 'VA': (37.52, -78.85), 'WA': (47.38, -120.45),
+    'WV': (38.64, -80.62), 'WI': (44.62, -89.99), 'WY': (42.99, -107.55),
+}
+
+# ( city, state ): ( latitude, longitude ); _place_key() spelling of the city
+CITY_CENTROIDS = {
+    ('birmingham', 'AL'): (33.52, -86.80), ('montgomery', 'AL'): (32.37, -86.30),
+    ('mobile', 'AL'): (30.69, -88.04), ('huntsville', 'AL'): (34.73, -86.59),
+    ('anchorage', 'AK'): (61.22, -149.90), ('fairbanks', 'AK'): (64.84, -147.72),
+    ('juneau', 'AK'): (58.30, -134.42),
+    ('phoenix', 'AZ'): (33.45, -112.07), ('tucson', 'AZ'): (32.22, -110.97),
+    ('mesa', 'AZ'): (33.42, -111.83), ('scottsdale', 'AZ'): (33.49, -111.93),
+    ('tempe', 'AZ'): (33.43, -111.94), ('flagstaff', 'AZ'): (35.20, -111.65),
+    ('little rock', 'AR'): (34.75, -92.29), ('fayetteville', 'AR'): (36.06, -94.16),
+    ('los angeles', 'CA'): (34.05, -118.24), ('san francisco', 'CA'): (37.77, -122.42),
+    ('san diego', 'CA'): (32.72, -117.16), ('san jose', 'CA'): (37.34, -121.89),
+    ('oakland', 'CA'): (37.80, -122.27), ('sacramento', 'CA'): (38.58, -121.49),
+    ('fresno', 'CA'): (36.74, -119.79), ('long beach', 'CA'): (33.77, -118.19),
+    ('berkeley', 'CA'): (37.87, -122.27), ('santa monica', 'CA'): (34.02, -118.49),
+    ('pasadena', 'CA'): (34.15, -118.14), ('anaheim', 'CA'): (33.84, -117.91),
+    ('hollywood', 'CA'): (34.09, -118.33), ('west hollywood', 'CA'): (34.09, -118.36),
+    ('santa barbara', 'CA'): (34.42, -119.70), ('santa cruz', 'CA'): (36.97, -122.03),
+    ('riverside', 'CA'): (33.98, -117.38), ('bakersfield', 'CA'): (35.37, -119.02),
+    ('denver', 'CO'): (39.74, -104.99), ('boulder', 'CO'): (40.01, -105.27),
+    ('colorado springs', 'CO'): (38.83, -104.82), ('fort collins', 'CO'): (40.59, -105.08),
+    ('hartford', 'CT'): (41.76, -72.67), ('new haven', 'CT'): (41.31, -72.92),
+    ('bridgeport', 'CT'): (41.19, -73.20), ('stamford', 'CT'): (41.05, -73.54),
+    ('wilmington', 'DE'): (39.74, -75.55), ('dover', 'DE'): (39.16, -75.52),
+    ('washington', 'DC'): (38.91, -77.04),
+    ('miami', 'FL'): (25.76, -80.19), ('miami beach', 'FL'): (25.79, -80.13),
+    ('orlando', 'FL'): (28.54, -81.38), ('tampa', 'FL'): (27.95, -82.46),
+    ('jacksonville', 'FL'): (30.33, -81.66), ('tallahassee', 'FL'): (30.44, -84.28),
+    ('st petersburg', 'FL'): (27.77, -82.64), ('fort lauderdale', 'FL'): (26.12, -80.14),
+    ('gainesville', 'FL'): (29.65, -82.32), ('key west', 'FL'): (24.56, -81.78),
+    ('atlanta', 'GA'): (33.75, -84.39), ('savannah', 'GA'): (32.08, -81.09),
+    ('athens', 'GA'): (33.96, -83.38), ('augusta', 'GA'): (33.47, -81.97),
+    ('macon', 'GA'): (32.84, -83.63),
+    ('honolulu', 'HI'): (21.31, -157.86), ('hilo', 'HI'): (19.71, -155.09),
+    ('boise', 'ID'): (43.62, -116.20),
+    ('chicago', 'IL'): (41.88, -87.63), ('springfield', 'IL'): (39.78, -89.65),
+    ('evanston', 'IL'): (42.05, -87.69), ('peoria', 'IL'): (40.69, -89.59),
+    ('champaign', 'IL'): (40.12, -88.24),
+    ('indianapolis', 'IN'): (39.77, -86.16), ('bloomington', 'IN'): (39.17, -86.53),
+    ('fort wayne', 'IN'): (41.08, -85.14),
+    ('des moines', 'IA'): (41.59, -93.62), ('iowa city', 'IA'): (41.66, -91.53),
+    ('cedar rapids', 'IA'): (41.98, -91.67),
+    ('wichita', 'KS'): (37.69, -97.34), ('kansas city', 'KS'): (39.11, -94.63),
+    ('lawrence', 'KS'): (38.97, -95.24), ('topeka', 'KS'): (39.05, -95.68),
+    ('louisville', 'KY'): (38.25, -85.76), ('lexington', 'KY'): (38.04, -84.50),
+    ('new orleans', 'LA'): (29.95, -90.07), ('baton rouge', 'LA'): (30.45, -91.19),
+    ('shreveport', 'LA'): (32.53, -93.75), ('lafayette', 'LA'): (30.22, -92.02),
+    ('portland', 'ME'): (43.66, -70.26), ('bangor', 'ME'): (44.80, -68.77),
+    ('baltimore', 'MD'): (39.29, -76.61), ('annapolis', 'MD'): (38.98, -76.49),
+    ('silver spring', 'MD'): (38.99, -77.03),
+    ('boston', 'MA'): (42.36, -71.06), ('cambridge', 'MA'): (42.37, -71.11),
+    ('somerville', 'MA'): (42.39, -71.10), ('worcester', 'MA'): (42.26, -71.80),
+    ('springfield', 'MA'): (42.10, -72.59),
+    ('detroit', 'MI'): (42.33, -83.05), ('ann arbor', 'MI'): (42.28, -83.74),
+    ('grand rapids', 'MI'): (42.96, -85.67), ('lansing', 'MI'): (42.73, -84.56),
+    ('minneapolis', 'MN'): (44.98, -93.27), ('st paul', 'MN'): (44.95, -93.09),
+    ('duluth', 'MN'): (46.79, -92.10),
+    ('jackson', 'MS'): (32.30, -90.18), ('oxford', 'MS'): (34.37, -89.52),
+    ('kansas city', 'MO'): (39.10, -94.58), ('st louis', 'MO'): (38.63, -90.20),
+    ('springfield', 'MO'): (37.21, -93.29), ('columbia', 'MO'): (38.95, -92.33),
+    ('missoula', 'MT'): (46.87, -113.99), ('billings', 'MT'): (45.78, -108.50),
+    ('bozeman', 'MT'): (45.68, -111.04),
+    ('omaha', 'NE'): (41.26, -95.93), ('lincoln', 'NE'): (40.81, -96.70),
+    ('las vegas', 'NV'): (36.17, -115.14), ('reno', 'NV'): (39.53, -119.81),
+    ('henderson', 'NV'): (36.04, -114.98),
+    ('manchester', 'NH'): (42.99, -71.46), ('portsmouth', 'NH'): (43.07, -70.76),
+    ('concord', 'NH'): (43.21, -71.54),
+    ('newark', 'NJ'): (40.74, -74.17), ('jersey city', 'NJ'): (40.73, -74.08),
+    ('hoboken', 'NJ'): (40.74, -74.03), ('asbury park', 'NJ'): (40.22, -74.01),
+    ('trenton', 'NJ'): (40.22, -74.76), ('atlantic city', 'NJ'): (39.36, -74.42),
+    ('albuquerque', 'NM'): (35.08, -106.65), ('santa fe', 'NM'): (35.69, -105.94),
+    ('new york', 'NY'): (40.71, -74.01), ('new york city', 'NY'): (40.71, -74.01),
+    ('manhattan', 'NY'): (40.78, -73.97), ('brooklyn', 'NY'): (40.68, -73.94),
+    ('queens', 'NY'): (40.73, -73.79), ('bronx', 'NY'): (40.84, -73.86),
+    ('buffalo', 'NY'): (42.89, -78.88), ('rochester', 'NY'): (43.16, -77.61),
+    ('albany', 'NY'): (42.65, -73.76), ('syracuse', 'NY'): (43.05, -76.15),
+    ('ithaca', 'NY'): (42.44, -76.50),
+    ('charlotte', 'NC'): (35.23, -80.84), ('raleigh', 'NC'): (35.78, -78.64),
+    ('durham', 'NC'): (35.99, -78.90), ('chapel hill', 'NC'): (35.91, -79.06),
+    ('asheville', 'NC'): (35.60, -82.55), ('greensboro', 'NC'): (36.07, -79.79),
+    ('wilmington', 'NC'): (34.23, -77.94),
+    ('fargo', 'ND'): (46.88, -96.79), ('bismarck', 'ND'): (46.81, -100.78),
+    ('columbus', 'OH'): (39.96, -83.00), ('cleveland', 'OH'): (41.50, -81.69),
+    ('cincinnati', 'OH'): (39.10, -84.51), ('dayton', 'OH'): (39.76, -84.19),
+    ('toledo', 'OH'): (41.65, -83.54), ('akron', 'OH'): (41.08, -81.52),
+    ('oklahoma city', 'OK'): (35.47, -97.52), ('tulsa', 'OK'): (36.15, -95.99),
+    ('norman', 'OK'): (35.22, -97.44),
+    ('portland', 'OR'): (45.52, -122.68), ('eugene', 'OR'): (44.05, -123.09),
+    ('salem', 'OR'): (44.94, -123.04), ('bend', 'OR'): (44.06, -121.31),
+    ('philadelphia', 'PA'): (39.95, -75.17), ('pittsburgh', 'PA'): (40.44, -80.00),
+    ('harrisburg', 'PA'): (40.27, -76.88), ('allentown', 'PA'): (40.61, -75.49),
+    ('erie', 'PA'): (42.13, -80.09),
+    ('providence', 'RI'): (41.82, -71.41), ('newport', 'RI'): (41.49, -71.31),
+    ('charleston', 'SC'): (32.78, -79.93), ('columbia', 'SC'): (34.00, -81.03),
+    ('greenville', 'SC'): (34.85, -82.40),
+    ('sioux falls', 'SD'): (43.54, -96.73), ('rapid city', 'SD'): (44.08, -103.23),
+    ('nashville', 'TN'): (36.16, -86.78), ('memphis', 'TN'): (35.15, -90.05),
+    ('knoxville', 'TN'): (35.96, -83.92), ('chattanooga', 'TN'): (35.05, -85.31),
+    ('houston', 'TX'): (29.76, -95.37), ('austin', 'TX'): (30.27, -97.74),
+    ('dallas', 'TX'): (32.78, -96.80), ('san antonio', 'TX'): (29.42, -98.49),
+    ('fort worth', 'TX'): (32.76, -97.33), ('el paso', 'TX'): (31.76, -106.49),
+    ('denton', 'TX'): (33.21, -97.13), ('lubbock', 'TX'): (33.58, -101.86),
+    ('corpus christi', 'TX'): (27.80, -97.40),
+    ('salt lake city', 'UT'): (40.76, -111.89), ('provo', 'UT'): (40.23, -111.66),
+    ('ogden', 'UT'): (41.22, -111.97),
+    ('burlington', 'VT'): (44.48, -73.21), ('montpelier', 'VT'): (44.26, -72.58),
+    ('richmond', 'VA'): (37.54, -77.44), ('virginia beach', 'VA'): (36.85, -75.98),
+    ('norfolk', 'VA'): (36.85, -76.29), ('arlington', 'VA'): (38.88, -77.10),
+    ('alexandria', 'VA'): (38.80, -77.05), ('charlottesville', 'VA'): (38.03, -78.48),
+    ('seattle', 'WA'): (47.61, -122.33), ('spokane', 'WA'): (47.66, -117.43),
+    ('tacoma', 'WA'): (47.25, -122.44), ('olympia', 'WA'): (47.04, -122.90),
+    ('bellingham', 'WA'): (48.75, -122.48),
+    ('charleston', 'WV'): (38.35, -81.63), ('morgantown', 'WV'): (39.63, -79.96),
+    ('milwaukee', 'WI'): (43.04, -87.91), ('madison', 'WI'): (43.07, -89.40),
+    ('green bay', 'WI'): (44.51, -88.02),
+    ('cheyenne', 'WY'): (41.14, -104.82), ('jackson', 'WY'): (43.48, -110.76),
+    ('laramie', 'WY'): (41.31, -105.59),
+}
+
+
+def _place_key(city):
+    words = (city or '').replace('.', ' ').casefold().split()
+    if words and words[0] == 'saint':
+        words[0] = 'st'
+    return ' '.join(words)
+
+
+def _coordinates(city, state):
+    state = (state or '').strip().upper()
+    latitude, longitude = CITY_CENTROIDS.get((_place_key(city), state)) or STATE_CENTROIDS.get(state) or (None, None)
+    if latitude is None:
+        return {'latitude': None, 'longitude': None, 'geo_cell': None}
+    row = int((latitude + 90) // GEO_CELL_DEGREES)
+    column = min(int((longitude + 180) // GEO_CELL_DEGREES), GRID_COLUMNS - 1)
+    return {'latitude': latitude, 'longitude': longitude, 'geo_cell': row * GRID_COLUMNS + column}
+
+
+def _place_venues(connection):
+    venues = sa.table('Venue', sa.column('id', sa.Integer()), sa.column('city', sa.String()),
+                      sa.column('state', sa.String()), sa.column('latitude', sa.Float()),
+                      sa.column('longitude', sa.Float()), sa.column('geo_cell', sa.Integer()))
+    placed = [dict(_coordinates(city, state), venue_id=id)
+              for id, city, state in connection.execute(sa.select(venues.c.id, venues.c.city, venues.c.state))]
+    if placed:
+        connection.execute(
+            venues.update().where(venues.c.id == sa.bindparam('venue_id')).values(
+                latitude=sa.bindparam('latitude'), longitude=sa.bindparam('longitude'),
+                geo_cell=sa.bindparam('geo_cell')),
+            placed)
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('geo_cell', sa.Integer(), nullable=True))
+    _place_venues(op.get_bind())
+    op.create_index('ix_Venue_geo_cell', 'Venue', ['geo_cell', 'latitude', 'longitude'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_geo_cell', table_name='Venue')
+    op.drop_column('Venue', 'geo_cell')
+    op.drop_column('Venue', 'longitude')
+    op.drop_column('Venue', 'latitude')
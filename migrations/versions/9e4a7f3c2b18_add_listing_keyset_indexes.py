@@ -0,0 +1,28 @@
+"""add listing keyset indexes
+
+Revision ID: 9e4a7f3c2b18
+Revises: 5b2e8c1d9a47
+Create Date: 2026-10-18 10:03:47.592816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4a7f3c2b18'
+down_revision = '5b2e8c1d9a47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_name_id', 'Venue', ['name', 'id'], unique=False)
+    op.create_index('ix_Artist_name_id', 'Artist', ['name', 'id'], unique=False)
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
+    op.drop_index('ix_Artist_name_id', table_name='Artist')
+    op.drop_index('ix_Venue_name_id', table_name='Venue')
@@ -0,0 +1,69 @@
+"""add show duration and overlap constraints
+
+Existing shows get the default duration. On Postgres the exclusion
+constraints of bookings.py are added next; the upgrade stops and lists
+the double bookings when shows of a venue or an artist already overlap,
+as they have to be moved or shortened first.
+
+Revision ID: b6e0d3f81a25
+Revises: 8a1f4c7d2e63
+Create Date: 2026-10-18 17:48:05.221964
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e0d3f81a25'
+down_revision = '8a1f4c7d2e63'
+branch_labels = None
+depends_on = None
+
+DEFAULT_DURATION = 120
+MAX_DURATION = 24 * 60
+KINDS = ('venue', 'artist')
+
+# shows starting before an earlier show of their venue / artist has ended
+OVERLAPS = """
+SELECT id, {kind}_id, start_time FROM (
+    SELECT id, {kind}_id, start_time,
+           max(start_time + duration * interval '1 minute') OVER (
+               PARTITION BY {kind}_id ORDER BY start_time, id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS busy_until
+    FROM "Show") AS shows
+WHERE busy_until > start_time
+ORDER BY start_time
+LIMIT 20
+"""
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('duration', sa.Integer(), nullable=False,
+                                    server_default=str(DEFAULT_DURATION)))
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.create_check_constraint('ck_Show_duration', f'duration BETWEEN 1 AND {MAX_DURATION}')
+
+    connection = op.get_bind()
+    if connection.dialect.name != 'postgresql':
+        return
+    overlaps = [f'show {id} ( {kind} {kind_id} ) at {start_time}'
+                for kind in KINDS
+                for id, kind_id, start_time in connection.execute(sa.text(OVERLAPS.format(kind=kind)))]
+    if overlaps:
+        raise RuntimeError('these shows overlap an earlier show of their venue or artist, '
+                           'move or shorten them and upgrade again:\n  ' + '\n  '.join(overlaps))
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for kind in KINDS:
+        op.execute(f'ALTER TABLE "Show" ADD CONSTRAINT "ex_Show_{kind}_overlap" EXCLUDE USING gist '
+                   f'({kind}_id WITH =, tsrange(start_time, start_time + duration * interval \'1 minute\') WITH &&)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for kind in reversed(KINDS):
+            op.drop_constraint(f'ex_Show_{kind}_overlap', 'Show')
+        op.drop_constraint('ck_Show_duration', 'Show', type_='check')
+    # SQLite rebuilds the table, leaving out the check constraint it does not reflect
+    with op.batch_alter_table('Show') as batch_op:
+        batch_op.drop_column('duration')
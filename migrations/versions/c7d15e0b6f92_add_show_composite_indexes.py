@@ -0,0 +1,35 @@
+"""add show composite indexes
+
+Revision ID: c7d15e0b6f92
+Revises: 9e4a7f3c2b18
+Create Date: 2026-10-18 11:26:05.318840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d15e0b6f92'
+down_revision = '9e4a7f3c2b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY does not lock writes to "Show" but cannot
+    # run inside a transaction block.
+    # ordering by start_time is served by ix_Show_start_time_id
+    with op.get_context().autocommit_block():
+        op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'],
+                        unique=False, postgresql_concurrently=True)
+        op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_Show_artist_id_start_time', table_name='Show',
+                      postgresql_concurrently=True)
+        op.drop_index('ix_Show_venue_id_start_time', table_name='Show',
+                      postgresql_concurrently=True)
@@ -0,0 +1,48 @@
+"""make venue and artist names not null
+
+The listings page on ( name, id ) ( pagination.py ); a NULL name compares
+as unknown and its row would drop out of every page after the first.
+Unnamed rows get an empty name, which sorts first. SQLite rebuilds the
+tables for it, dropping their triggers ( the FTS5 search index of
+search.py ): they are created again as they were.
+
+Revision ID: d3b7f15a9c42
+Revises: b6e0d3f81a25
+Create Date: 2026-10-18 19:12:36.480219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3b7f15a9c42'
+down_revision = 'b6e0d3f81a25'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist')
+
+
+def _alter_name(table, nullable):
+    connection = op.get_bind()
+    triggers = []
+    if connection.dialect.name == 'sqlite':
+        triggers = [sql for sql, in connection.execute(sa.text(
+            "SELECT sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = :table"), {'table': table})]
+    with op.batch_alter_table(table) as batch_op:
+        batch_op.alter_column('name', existing_type=sa.String(), nullable=nullable)
+    for sql in triggers:
+        op.execute(sql)
+
+
+def upgrade():
+    for table in TABLES:
+        names = sa.table(table, sa.column('name', sa.String()))
+        op.execute(names.update().where(names.c.name.is_(None)).values(name=''))
+        _alter_name(table, nullable=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        _alter_name(table, nullable=True)
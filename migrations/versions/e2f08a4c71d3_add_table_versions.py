@@ -0,0 +1,36 @@
+"""add table versions
+
+Revision ID: e2f08a4c71d3
+Revises: c7d15e0b6f92
+Create Date: 2026-10-18 13:41:52.770214
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f08a4c71d3'
+down_revision = 'c7d15e0b6f92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_version = op.create_table('TableVersion',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    now = datetime.utcnow()
+    op.bulk_insert(table_version, [
+        {'table_name': name, 'version': 0, 'changed_at': now}
+        for name in ('Venue', 'Artist', 'Show')
+    ])
+
+
+def downgrade():
+    op.drop_table('TableVersion')
@@ -1,11 +1,24 @@
-from flask_sqlalchemy import SQLAlchemy
+from replicas import RoutingSQLAlchemy
+
+db = RoutingSQLAlchemy()
+
+
+class StringArray(db.TypeDecorator):
+    """ARRAY(String) on Postgres, a JSON encoded list on other backends (local SQLite runs)."""
+    impl = db.JSON
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(db.ARRAY(db.String()))
+        return dialect.type_descriptor(db.JSON())
+
 
-db = SQLAlchemy()
 class Venue(db.Model):
     __tablename__ = 'Venue'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
@@ -13,26 +26,42 @@ class Venue(db.Model):
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     #add missing columns ( genre, ... )
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(StringArray)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     #add missing columns(website_link,seeking_talent,seeking_description )
     website_link=db.Column(db.String(120))
     seeking_talent=db.Column(db.Boolean)
     seeking_description=db.Column(db.String(500))
+    # centre of the city ( or state ) and its cell of the grid, see geo.py
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geo_cell = db.Column(db.Integer)
     #add relationships 
     shows=db.relationship('Show', backref='venue', lazy=True)
 
+    __table_args__ = (
+        # serves the substring search in search.py ( needs pg_trgm )
+        db.Index('ix_Venue_name_trgm', 'name',
+                 postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        # keyset pagination of /venues
+        db.Index('ix_Venue_name_id', 'name', 'id'),
+        # ?genre= filters ( genres @> ARRAY[...], see genres.py )
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+        # radius search of /venues/near, answered from the index alone
+        db.Index('ix_Venue_geo_cell', 'geo_cell', 'latitude', 'longitude'),
+    )
+
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
+    name = db.Column(db.String, nullable=False)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String()))
+    genres = db.Column(StringArray)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     # Add missing columns
@@ -42,6 +71,19 @@ class Artist(db.Model):
     #add relationships 
     shows=db.relationship('Show', backref='artist', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_Artist_name_trgm', 'name',
+                 postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}),
+        # keyset pagination of /artists
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
+
+
+# minutes; no show is longer than the maximum ( bookings.py relies on it )
+DEFAULT_SHOW_DURATION = 120
+MAX_SHOW_DURATION = 24 * 60
+
 
 class Show(db.Model):
     __tablename__ = 'Show'
@@ -50,3 +92,23 @@ class Show(db.Model):
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
     artist_id= db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
     start_time= db.Column(db.DateTime, nullable=False)
+    duration = db.Column(db.Integer, nullable=False, default=DEFAULT_SHOW_DURATION,
+                         server_default=str(DEFAULT_SHOW_DURATION))
+
+    __table_args__ = (
+        db.CheckConstraint(f'duration BETWEEN 1 AND {MAX_SHOW_DURATION}', name='ck_Show_duration'),
+        # keyset pagination and ordering of /shows
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        # past / upcoming shows of one venue or artist ( detail pages, counts )
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+    )
+
+
+class TableVersion(db.Model):
+    """Change counter of a table, bumped by every flush that writes to it ( see conditional.py )."""
+    __tablename__ = 'TableVersion'
+
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    changed_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,151 @@
+"""Keyset (cursor) pagination for the listing pages.
+
+A page is fetched with ``WHERE (key columns) > (last key seen)`` instead of
+an OFFSET, so with an index on the key columns every page costs the same
+as the first one. Cursors are the key values of the boundary row, JSON
+encoded and base64'd so they can travel in a query string.
+
+:class:`StreamedPage` is the streaming variant: rows come off a
+server-side cursor while the template is being rendered, so a page never
+sits in memory as a whole.
+"""
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from flask import abort, current_app, request
+from sqlalchemy import tuple_
+
+from models import db
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'prev_cursor', 'limit'])
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value
+              for value in values]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Turn a cursor back into key values, or abort with a 400 if it is garbage."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [datetime.fromisoformat(value) if isinstance(column.type, db.DateTime) else value
+                for column, value in zip(columns, values)]
+    except (ValueError, TypeError, binascii.Error):
+        abort(400, 'Invalid page cursor')
+
+
+def wants_stream():
+    """``?stream=1`` / ``?stream=0`` or the STREAM_LISTINGS default."""
+    return bool(request.args.get('stream', current_app.config['STREAM_LISTINGS'], type=int))
+
+
+def page_args(stream=False):
+    """Read ``after``, ``before`` and ``limit`` from the query string.
+
+    Streamed pages do not grow memory with their size, so they may be larger.
+    """
+    default = current_app.config['LISTING_PAGE_SIZE']
+    maximum = current_app.config['LISTING_STREAM_MAX_PAGE_SIZE' if stream else 'LISTING_MAX_PAGE_SIZE']
+    limit = request.args.get('limit', default, type=int)
+    return {
+        'after': request.args.get('after') or None,
+        'before': request.args.get('before') or None,
+        'limit': max(1, min(limit, maximum)),
+    }
+
+
+def _key(row, columns):
+    return [getattr(row, column.key) for column in columns]
+
+
+def keyset_query(query, columns, after=None, before=None, limit=50):
+    """Restrict and order ``query`` for one page, fetching one extra row.
+
+    The extra row only tells whether there is another page in the walking
+    direction; :func:`keyset_page` strips it off again.
+    """
+    key = tuple_(*columns)
+    if before is not None:
+        query = query.filter(key < tuple_(*decode_cursor(before, columns)))
+        return query.order_by(*[column.desc() for column in columns]).limit(limit + 1)
+    if after is not None:
+        query = query.filter(key > tuple_(*decode_cursor(after, columns)))
+    return query.order_by(*columns).limit(limit + 1)
+
+
+def keyset_page(query, columns, after=None, before=None, limit=50):
+    """Return the :class:`Page` of ``query`` rows following ``after`` or preceding ``before``.
+
+    ``columns`` are the (unique together, indexed) key columns, e.g.
+    ``(Show.start_time, Show.id)``; the rows must expose them as attributes.
+    """
+    rows = keyset_query(query, columns, after, before, limit).all()
+    return page_from_rows(rows, columns, after, before, limit)
+
+
+def page_from_rows(rows, columns, after=None, before=None, limit=50):
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if before is not None:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = after is not None, more
+    next_cursor = encode_cursor(_key(rows[-1], columns)) if rows and has_next else None
+    prev_cursor = encode_cursor(_key(rows[0], columns)) if rows and has_prev else None
+    return Page(rows, next_cursor, prev_cursor, limit)
+
+
+class StreamedPage(object):
+    """A page whose rows are fetched while they are iterated over.
+
+    Iterating yields ``serialize(row)`` for each row, read in chunks of
+    LISTING_STREAM_CHUNK_SIZE from a server-side cursor. ``next_cursor`` and
+    ``prev_cursor`` are only known once the rows have been consumed, which
+    is the case by the time a template renders the pager under the rows.
+    Pages walked backwards (``before``) are buffered, since their rows
+    come out of the database in reverse; they are at most ``limit`` long.
+    """
+
+    def __init__(self, query, columns, serialize, after=None, before=None, limit=50):
+        self.limit = limit
+        self.next_cursor = None
+        self.prev_cursor = None
+        self._query = query
+        self._columns = columns
+        self._serialize = serialize
+        self._after = after
+        self._rows = None
+        if before is not None:
+            page = keyset_page(query, columns, after, before, limit)
+            self._rows = page.items
+            self.next_cursor = page.next_cursor
+            self.prev_cursor = page.prev_cursor
+
+    def __iter__(self):
+        if self._rows is not None:
+            for row in self._rows:
+                yield self._serialize(row)
+            return
+
+        query = keyset_query(self._query, self._columns, self._after, None, self.limit)
+        count = 0
+        last = None
+        for row in query.yield_per(current_app.config['LISTING_STREAM_CHUNK_SIZE']):
+            if count == self.limit:
+                self.next_cursor = encode_cursor(_key(last, self._columns))
+                break
+            if count == 0 and self._after is not None:
+                self.prev_cursor = encode_cursor(_key(row, self._columns))
+            count += 1
+            last = row
+            yield self._serialize(row)
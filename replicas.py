@@ -0,0 +1,164 @@
+"""Read-replica routing for the Flask-SQLAlchemy session.
+
+``GET`` / ``HEAD`` requests read from one of ``SQLALCHEMY_REPLICA_URIS``;
+everything else, CLI commands and any flush or DML statement use the
+primary. A request that wrote marks its client with a cookie so that its
+next requests, for ``REPLICA_STICKY_SECONDS``, read from the primary too
+and see their own writes. The cookie is not signed: it holds nothing but a
+time, and a client changing it only changes where its own reads go.
+
+A daemon thread of each process checks the replicas' lag every
+``REPLICA_CHECK_INTERVAL`` seconds, off the request path; a replica that is
+unreachable, further behind than ``REPLICA_MAX_LAG`` seconds, or not
+checked yet is skipped and requests fall back to the next replica, then
+to the primary.
+"""
+import itertools
+import os
+import threading
+import time
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, orm, text
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'db_primary_until'
+
+POSTGRES_LAG = text(
+    'select case when pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() then 0 '
+    'else coalesce(extract(epoch from now() - pg_last_xact_replay_timestamp()), 0) end'
+)
+
+
+class Replica(object):
+
+    def __init__(self, url, engine):
+        self.url = url
+        self.engine = engine
+        self.lag = None
+        self.healthy = False
+        self.checked_at = 0.0
+
+    def check(self, max_lag):
+        try:
+            with self.engine.connect() as connection:
+                if connection.dialect.name == 'postgresql':
+                    self.lag = float(connection.execute(POSTGRES_LAG).scalar())
+                else:
+                    connection.execute(text('select 1'))
+                    self.lag = 0.0
+            self.healthy = self.lag <= max_lag
+        except Exception:
+            self.lag = None
+            self.healthy = False
+        self.checked_at = time.monotonic()
+
+
+class ReplicaSet(object):
+    """The replicas of one app, handed out round robin while they are healthy."""
+
+    def __init__(self, app):
+        # imported here: dbpool imports models, which imports this module
+        from dbpool import engine_options
+        self.max_lag = app.config['REPLICA_MAX_LAG']
+        self.check_interval = app.config['REPLICA_CHECK_INTERVAL']
+        self.replicas = [
+            Replica(url, create_engine(url, **engine_options({**app.config, 'SQLALCHEMY_DATABASE_URI': url})))
+            for url in app.config['SQLALCHEMY_REPLICA_URIS']
+        ]
+        self.lock = threading.Lock()
+        self.order = itertools.cycle(range(len(self.replicas)))
+        self.pid = None
+        for replica in self.replicas:
+            event.listen(replica.engine, 'handle_error', self._mark_down(replica))
+
+    def _mark_down(self, replica):
+        def handle_error(context):
+            if context.is_disconnect:
+                replica.healthy = False
+                replica.checked_at = time.monotonic()
+        return handle_error
+
+    def check(self):
+        for replica in self.replicas:
+            replica.check(self.max_lag)
+
+    def _check_forever(self):
+        while True:
+            self.check()
+            time.sleep(self.check_interval)
+
+    def _start_checks(self):
+        # the thread does not survive a fork: start one per process
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+        threading.Thread(target=self._check_forever, name='replica-checks', daemon=True).start()
+
+    def pick(self):
+        """A healthy replica engine, or None to use the primary."""
+        if not self.replicas:
+            return None
+        self._start_checks()
+        with self.lock:
+            start = next(self.order)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(start + i) % len(self.replicas)]
+            if replica.healthy:
+                return replica.engine
+        return None
+
+    def status(self):
+        return [{'url': replica.engine.url.render_as_string(hide_password=True), 'healthy': replica.healthy,
+                 'lag': replica.lag} for replica in self.replicas]
+
+
+def wants_replica():
+    if not has_request_context() or request.method not in READ_METHODS:
+        return False
+    try:
+        primary_until = float(request.cookies.get(STICKY_COOKIE, 0))
+    except ValueError:
+        primary_until = 0
+    return primary_until < time.time()
+
+
+class RoutingSession(SignallingSession):
+    """Sends the reads of read-only requests to a replica, all else to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        writing = self._flushing or (clause is not None and getattr(clause, 'is_dml', False))
+        if writing:
+            if has_request_context():
+                g.db_wrote = True
+        else:
+            replicas = self.app.extensions.get('replicas')
+            if replicas is not None and wants_replica():
+                # one replica for the whole request, so its reads see one state
+                if not hasattr(self, '_replica'):
+                    self._replica = replicas.pick()
+                if self._replica is not None:
+                    return self._replica
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def init_app(app):
+    if not app.config.get('SQLALCHEMY_REPLICA_URIS'):
+        return
+    app.extensions['replicas'] = ReplicaSet(app)
+
+    @app.after_request
+    def stick_to_primary(response):
+        if g.get('db_wrote'):
+            seconds = app.config['REPLICA_STICKY_SECONDS']
+            response.set_cookie(STICKY_COOKIE, f'{time.time() + seconds:.3f}', max_age=seconds,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,101 @@
+"""Name search for venues and artists.
+
+On Postgres the substring match is answered by the pg_trgm GIN indexes on
+the name columns and results are ordered by trigram similarity. Local
+SQLite databases get an FTS5 trigram table per model, kept in sync by
+triggers and ordered by bm25 rank. In both cases the total number of
+matches comes back in the same statement as the (limited) results.
+Results can be narrowed to genres, whose counts :func:`search_facets`
+returns ( see genres.py ).
+"""
+from sqlalchemy import DDL, column, event, func, literal_column, table
+
+from genres import facet_counts, filter_genres
+from models import db, Venue, Artist
+
+# the trigram tokenizer cannot match anything shorter than this
+FTS_MIN_TERM_LENGTH = 3
+
+
+def _fts_name(model):
+    return model.__tablename__ + '_fts'
+
+
+def _register_sqlite_fts(model):
+    """Create / drop the FTS5 shadow table together with the model table."""
+    source = model.__tablename__
+    fts = _fts_name(model)
+    statements = [
+        f'CREATE VIRTUAL TABLE "{fts}" USING fts5('
+        f'name, content=\'{source}\', content_rowid=\'id\', tokenize=\'trigram\')',
+        f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{source}" BEGIN '
+        f'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+        f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{source}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name) VALUES (\'delete\', old.id, old.name); END',
+        f'CREATE TRIGGER "{fts}_au" AFTER UPDATE OF name ON "{source}" BEGIN '
+        f'INSERT INTO "{fts}"("{fts}", rowid, name) VALUES (\'delete\', old.id, old.name); '
+        f'INSERT INTO "{fts}"(rowid, name) VALUES (new.id, new.name); END',
+        f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')',
+    ]
+    for statement in statements:
+        event.listen(model.__table__, 'after_create',
+                     DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(model.__table__, 'before_drop',
+                 DDL(f'DROP TABLE IF EXISTS "{fts}"').execute_if(dialect='sqlite'))
+
+
+_register_sqlite_fts(Venue)
+_register_sqlite_fts(Artist)
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _fts_phrase(term):
+    # quote the term so FTS5 treats it as one literal phrase
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _match(query, model, term, dialect):
+    """Restrict ``query`` to the name matches of ``term``; return it with their ordering."""
+    if dialect == 'sqlite' and len(term) >= FTS_MIN_TERM_LENGTH:
+        fts = table(_fts_name(model), column('rowid'), column('rank'))
+        query = query.join(fts, fts.c.rowid == model.id).filter(
+            literal_column(f'"{fts.name}"').op('MATCH')(_fts_phrase(term))
+        )
+        return query, (fts.c.rank, model.id)
+    query = query.filter(model.name.ilike(_like_pattern(term), escape='\\'))
+    if dialect == 'postgresql':
+        return query, (func.similarity(model.name, term).desc(), model.name, model.id)
+    return query, (model.name, model.id)
+
+
+def search(model, term, limit, session=None, genres=()):
+    """Return ``(count, rows)`` for the ``limit`` best name matches of ``term``.
+
+    Each row has ``id`` and ``name``; ``count`` is the number of matches
+    before the limit was applied. Only rows tagged with all of ``genres``
+    match. ``session`` defaults to ``db.session``.
+    """
+    session = session or db.session
+    query = session.query(
+        model.id,
+        model.name,
+        func.count().over().label('total'),
+    )
+    query = filter_genres(query, model, genres, session)
+    query, ordering = _match(query, model, term, session.get_bind().dialect.name)
+
+    results = query.order_by(*ordering).limit(limit).all()
+    count = results[0].total if results else 0
+    return count, results
+
+
+def search_facets(model, term, session=None, genres=()):
+    """Genre :class:`~genres.Facet` counts of all the matches of ``term``."""
+    session = session or db.session
+    query = filter_genres(session.query(model.id), model, genres, session)
+    query, ordering = _match(query, model, term, session.get_bind().dialect.name)
+    return facet_counts(query, model, genres, session, term)
@@ -2,3 +2,28 @@ window.parseISOString = function parseISOString(s) {
   var b = s.split(/\D+/);
   return new Date(Date.UTC(b[0], --b[1], b[2], b[3], b[4], b[5], b[6]));
 };
+
+// name suggestions for the search boxes, from /autocomplete
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('input[data-autocomplete]').forEach(function (input) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var pending = null;
+    input.addEventListener('input', function () {
+      var q = input.value.trim();
+      if (pending) { pending.abort(); }
+      if (!q) { list.innerHTML = ''; return; }
+      pending = new AbortController();
+      fetch(input.dataset.autocomplete + '&q=' + encodeURIComponent(q), { signal: pending.signal })
+        .then(function (response) { return response.json(); })
+        .then(function (payload) {
+          list.innerHTML = '';
+          payload.data.forEach(function (match) {
+            var option = document.createElement('option');
+            option.value = match.name;
+            list.appendChild(option);
+          });
+        })
+        .catch(function () {});
+    });
+  });
+});
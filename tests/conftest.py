@@ -0,0 +1,35 @@
+"""The app on a throwaway SQLite database, or on TEST_DATABASE_URL when set.
+
+The database is emptied and seeded by the tests that need data.
+"""
+import os
+import tempfile
+
+import pytest
+
+os.environ['DATABASE_URL'] = os.environ.get(
+    'TEST_DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'fyyur_test.db'))
+
+from app import app as fyyur_app  # noqa: E402  ( binds to DATABASE_URL on import )
+from cache import detail_cache  # noqa: E402
+from counts import upcoming_counts  # noqa: E402
+from genres import genre_facets  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def app():
+    # cold caches: every request does its full work
+    fyyur_app.config.update(
+        TESTING=True,
+        WTF_CSRF_ENABLED=False,
+        DETAIL_CACHE_BACKEND='null',
+        UPCOMING_COUNTS_BACKEND='null',
+        GENRE_FACETS_BACKEND='null',
+        SLOW_REQUEST_MS=float('inf'),
+        SLOW_REQUEST_QUERIES=float('inf'),
+        EXPORT_TOKEN='test-token',
+    )
+    detail_cache.init_app(fyyur_app)
+    upcoming_counts.init_app(fyyur_app)
+    genre_facets.init_app(fyyur_app)
+    return fyyur_app
@@ -0,0 +1,49 @@
+"""``flask build-assets`` ( assets.py ) keeping the previous build, and its manifest in the page validators."""
+import os
+from types import SimpleNamespace
+
+import assets
+
+
+def write(folder, path, content):
+    os.makedirs(os.path.dirname(os.path.join(folder, path)), exist_ok=True)
+    with open(os.path.join(folder, path), 'w') as f:
+        f.write(content)
+
+
+def built(static):
+    dist = os.path.join(static, assets.DIST_FOLDER)
+    return {os.path.relpath(os.path.join(root, name), dist).replace(os.sep, '/')
+            for root, dirs, files in os.walk(dist) for name in files}
+
+
+def test_rebuilds_keep_the_previous_files(tmp_path):
+    app = SimpleNamespace(static_folder=str(tmp_path))
+    write(app.static_folder, 'css/main.css', 'body { color: red }' * 20)
+    first = assets.build(app)
+    write(app.static_folder, 'css/main.css', 'body { color: blue }' * 20)
+    second = assets.build(app)
+    assert first['css/main.css'] != second['css/main.css']
+    assert {first['css/main.css'], second['css/main.css']} <= built(app.static_folder)
+
+    write(app.static_folder, 'css/main.css', 'body { color: green }' * 20)
+    third = assets.build(app)
+    files = built(app.static_folder)
+    assert first['css/main.css'] not in files and first['css/main.css'] + '.gz' not in files
+    assert {second['css/main.css'], third['css/main.css'], third['css/main.css'] + '.gz'} <= files
+
+
+def test_a_new_manifest_changes_the_etag(app):
+    client = app.test_client()
+    etag = client.get('/').headers.get('ETag')
+    saved = {key: app.extensions.pop(key, None) for key in ('assets_manifest', 'conditional_deploy_version')}
+    try:
+        app.extensions['assets_manifest'] = ('0123456789ab', 2e9)
+        response = client.get('/', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+    finally:
+        app.extensions.pop('conditional_deploy_version', None)
+        for key, value in saved.items():
+            if value is not None:
+                app.extensions[key] = value
@@ -0,0 +1,59 @@
+"""``/autocomplete`` answered from the prefix index ( autocomplete.py ), kept fresh off the request path."""
+import threading
+
+from autocomplete import PrefixIndex, autocomplete
+from benchmarks.catalogue import seed_catalogue
+from models import db, Venue
+
+
+def suggestions(client, q, **args):
+    return [(item['kind'], item['name']) for item in client.get('/autocomplete', query_string={'q': q, **args})
+            .get_json()['data']]
+
+
+def test_requests_read_what_the_background_build_loaded(app):
+    with app.app_context():
+        seed_catalogue(db, 5, 5, 0, seed=7)
+        venue = Venue(name='The Blue Room', city='Austin', state='TX')
+        db.session.add(venue)
+        db.session.commit()
+        venue_id = venue.id
+        # what the background thread runs every AUTOCOMPLETE_REFRESH_SECONDS
+        autocomplete.refresh()
+    client = app.test_client()
+    assert ('venue', 'The Blue Room') in suggestions(client, 'roo', kind='venue')
+
+    # commits of this process reach the index at once, without a rebuild
+    with app.app_context():
+        db.session.add(Venue(name='Roosevelt Hall', city='Austin', state='TX'))
+        db.session.get(Venue, venue_id).name = 'The Green Room'
+        db.session.commit()
+    found = suggestions(client, 'roo', kind='venue')
+    assert ('venue', 'Roosevelt Hall') in found and ('venue', 'The Green Room') in found
+    assert ('venue', 'The Blue Room') not in found
+
+
+def test_reads_during_writes_see_whole_entries():
+    index = PrefixIndex()
+    index.load([('venue', id, f'Hall {id:04d}') for id in range(2000)])
+    stop = threading.Event()
+    errors = []
+
+    def write():
+        id = 2000
+        while not stop.is_set():
+            index.put('artist', id, f'Hall Artist {id}')
+            index.remove('artist', id - 50)
+            id += 1
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for i in range(2000):
+            for kind, id, name in index.complete('hall', limit=20):
+                if not name.lower().startswith('hall'):
+                    errors.append(name)
+    finally:
+        stop.set()
+        writer.join()
+    assert not errors
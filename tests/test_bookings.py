@@ -0,0 +1,86 @@
+"""Double booking checks ( bookings.py ) against a brute force overlap test."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.catalogue import seed_catalogue
+from bookings import Booking, IntervalIndex, conflicts
+from models import db, Show
+
+ANCHOR = datetime(2030, 6, 1, 20)
+
+
+def overlaps(a, b):
+    return (a.start_time < b.start_time + timedelta(minutes=b.duration)
+            and b.start_time < a.start_time + timedelta(minutes=a.duration))
+
+
+def random_slot(rng, id=None):
+    return Booking(id, rng.randint(1, 5), rng.randint(1, 5),
+                   ANCHOR + timedelta(minutes=rng.randint(0, 3 * 24 * 60)), rng.choice((1, 30, 120, 24 * 60)))
+
+
+@pytest.fixture(scope='module')
+def booked(app):
+    with app.app_context():
+        seed_catalogue(db, 20, 40, 2000, seed=7, anchor=ANCHOR)
+        return [Booking(*row) for row in
+                db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time, Show.duration)]
+
+
+def test_interval_index():
+    rng = random.Random(1)
+    index, added = IntervalIndex(), []
+    for i in range(1000):
+        slot = random_slot(rng, i)
+        expected = [booking for booking in added
+                    if (booking.venue_id == slot.venue_id or booking.artist_id == slot.artist_id)
+                    and overlaps(booking, slot)]
+        assert sorted(index.overlapping(*slot[1:])) == sorted(expected)
+        index.add(slot)
+        added.append(slot)
+
+
+def test_generated_shows_do_not_overlap(booked):
+    index = IntervalIndex()
+    for booking in booked:
+        assert index.overlapping(*booking[1:]) == []
+        index.add(booking)
+
+
+def test_conflicts(app, booked):
+    rng = random.Random(2)
+    with app.app_context():
+        for i in range(300):
+            slot = Booking(None, rng.randint(1, 20), rng.randint(1, 40),
+                           ANCHOR + timedelta(days=rng.randint(-30, 30), minutes=rng.randint(-180, 180)),
+                           rng.choice((30, 120, 600)))
+            expected = [booking for booking in booked
+                        if (booking.venue_id == slot.venue_id or booking.artist_id == slot.artist_id)
+                        and overlaps(booking, slot)]
+            assert sorted(conflicts(*slot[1:])) == sorted(expected)
+
+
+def test_double_booking_is_refused(app, booked):
+    show = booked[0]
+    client = app.test_client()
+    form = {'venue_id': str(show.venue_id), 'artist_id': '40', 'duration': '30',
+            'start_time': (show.start_time + timedelta(minutes=show.duration - 1)).strftime('%Y-%m-%d %H:%M:%S')}
+    html = client.post('/shows/create', data=form).get_data(as_text=True)
+    assert 'slot is taken' in html and f'show {show.id} ' in html
+    form['start_time'] = (show.start_time + timedelta(minutes=show.duration)).strftime('%Y-%m-%d %H:%M:%S')
+    with app.app_context():
+        # free unless the artist plays then
+        free = not conflicts(show.venue_id, 40, datetime.strptime(form['start_time'], '%Y-%m-%d %H:%M:%S'), 30)
+    html = client.post('/shows/create', data=form).get_data(as_text=True)
+    assert ('Show was successfully listed!' in html) == free
+
+
+@pytest.mark.parametrize('field, value', [('start_time', 'garbage'), ('duration', '0'), ('duration', 'long')])
+def test_invalid_slot_is_refused(app, booked, field, value):
+    form = {'venue_id': str(booked[0].venue_id), 'artist_id': '40', 'duration': '30',
+            'start_time': '2031-01-01 20:00:00', field: value}
+    response = app.test_client().post('/shows/create', data=form)
+    assert response.status_code == 200
+    assert 'An error occurred. Show could not be listed.' in response.get_data(as_text=True)
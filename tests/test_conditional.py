@@ -0,0 +1,44 @@
+"""Conditional GET validators ( conditional.py ) around writes in the same second."""
+from datetime import datetime, timedelta
+
+import conditional
+from benchmarks.catalogue import seed_catalogue
+from models import db, Artist, TableVersion
+
+
+def set_changed_at(app, changed_at):
+    with app.app_context():
+        db.session.query(TableVersion).update({TableVersion.changed_at: changed_at})
+        db.session.commit()
+
+
+def test_last_modified_waits_for_the_second_to_end(app, monkeypatch):
+    with app.app_context():
+        seed_catalogue(db, 3, 3, 0, seed=2)
+    client = app.test_client()
+    changed_at = datetime.utcnow().replace(microsecond=500000) - timedelta(seconds=10)
+    set_changed_at(app, changed_at)
+
+    class Clock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return now
+
+    monkeypatch.setattr(conditional, 'datetime', Clock)
+    # still in the second of the last write: a later write in it would not move a whole second date
+    now = changed_at + timedelta(milliseconds=300)
+    response = client.get('/artists')
+    assert response.headers.get('ETag') and 'Last-Modified' not in response.headers
+
+    now = changed_at + timedelta(seconds=1)
+    response = client.get('/artists')
+    last_modified = response.headers['Last-Modified']
+    # rounded up to the end of the second of the write
+    assert last_modified.endswith(f'{(changed_at + timedelta(seconds=1)):%H:%M:%S} GMT')
+    assert client.get('/artists', headers={'If-Modified-Since': last_modified}).status_code == 304
+
+    with app.app_context():
+        db.session.add(Artist(name='Late Addition'))
+        db.session.commit()
+    now = datetime.utcnow() + timedelta(seconds=2)
+    assert client.get('/artists', headers={'If-Modified-Since': last_modified}).status_code == 200
@@ -0,0 +1,37 @@
+"""Upcoming show counts ( counts.py ) change together with the ETag of the page listing them."""
+from datetime import datetime, timedelta
+
+from benchmarks.catalogue import seed_catalogue
+from cache import LRUCache
+from conditional import bump_versions
+from counts import upcoming_counts
+from models import db, Show, Venue, Artist
+
+
+def test_shows_added_by_other_processes_are_counted(app, monkeypatch):
+    monkeypatch.setattr(upcoming_counts, 'backend', LRUCache(100))
+    monkeypatch.setattr(upcoming_counts, 'ttl', 3600)
+    with app.app_context():
+        seed_catalogue(db, 3, 3, 0, seed=5)
+        venue_id = db.session.query(Venue.id).first().id
+        artist_id = db.session.query(Artist.id).first().id
+    client = app.test_client()
+    url = '/api/v1/venues?fields=id,num_upcoming_shows&limit=10'
+
+    def counted(response):
+        return {item['id']: item['num_upcoming_shows'] for item in response.get_json()['data']}[venue_id]
+
+    first = client.get(url)
+    assert counted(first) == 0
+    hits = upcoming_counts.hits
+    client.get(url)
+    assert upcoming_counts.hits > hits
+
+    # as ``flask import shows`` writes: no eviction in this process
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(Show.__table__.insert().values(
+            venue_id=venue_id, artist_id=artist_id, start_time=datetime.now() + timedelta(days=3)))
+        bump_versions(connection, 'Show')
+    second = client.get(url)
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert counted(second) == 1
@@ -0,0 +1,25 @@
+"""The ``datetime`` template filter against babel."""
+from datetime import datetime
+
+import babel.dates
+import pytest
+
+from app import DATETIME_FORMATS, format_datetime
+
+DATES = [datetime(2026, 3, 5, 19, 7), datetime(2026, 12, 31, 0, 30), datetime(2027, 1, 1, 12, 0)]
+
+
+@pytest.mark.parametrize('date', DATES)
+@pytest.mark.parametrize('format', ['full', 'medium'])
+def test_fast_formats_match_their_patterns(date, format):
+    assert format_datetime(date, format) == babel.dates.format_datetime(date, DATETIME_FORMATS[format], locale='en')
+
+
+@pytest.mark.parametrize('date', DATES)
+@pytest.mark.parametrize('format', ['short', 'long', 'yyyy-MM-dd HH:mm'])
+def test_other_formats_go_to_babel(date, format):
+    assert format_datetime(date, format) == babel.dates.format_datetime(date, format, locale='en')
+
+
+def test_short():
+    assert format_datetime('2026-03-05T19:07:00', 'short') == '3/5/26, 7:07 PM'
@@ -0,0 +1,29 @@
+"""Connections inherited across a fork are replaced, never closed, and the pool status ( dbpool.py )."""
+import os
+from unittest import mock
+
+from sqlalchemy.pool import QueuePool
+
+import dbpool  # noqa: F401  ( registers the pool events )
+
+
+def test_connection_of_another_process_is_dropped_without_closing_it():
+    inherited, fresh = mock.Mock(), mock.Mock()
+    pool = QueuePool(mock.Mock(side_effect=[inherited, fresh]), pool_size=1, max_overflow=0)
+    pool.connect().close()
+    # as the child of a fork sees the record the parent opened
+    record = pool._pool.queue[0]
+    record.info['pid'] = os.getpid() + 1
+
+    connection = pool.connect()
+    assert connection.connection is fresh
+    assert record.info['pid'] == os.getpid()
+    inherited.close.assert_not_called()
+
+
+def test_status_needs_the_token(app):
+    client = app.test_client()
+    assert client.get('/api/v1/status').status_code == 401
+    assert client.get('/api/v1/status', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    status = client.get('/api/v1/status', headers={'Authorization': 'Bearer test-token'}).get_json()
+    assert status['pid'] == os.getpid() and 'checkouts' in status['pool']
@@ -0,0 +1,31 @@
+"""Detail pages read through ``detail_cache`` ( cache.py ) change together with their ETag."""
+from benchmarks.catalogue import seed_catalogue
+from cache import LRUCache, detail_cache
+from conditional import bump_versions
+from models import db, Venue
+
+
+def test_writes_of_other_processes_reach_the_cached_page(app, monkeypatch):
+    monkeypatch.setattr(detail_cache, 'backend', LRUCache(100))
+    monkeypatch.setattr(detail_cache, 'ttl', 60)
+    with app.app_context():
+        seed_catalogue(db, 3, 3, 0, seed=5)
+        venue = Venue(name='The Blue Room', city='Austin', state='TX', genres=['Jazz'])
+        db.session.add(venue)
+        db.session.commit()
+        venue_id = venue.id
+    client = app.test_client()
+    url = f'/venues/{venue_id}'
+    first = client.get(url)
+    hits = detail_cache.hits['venue']
+    assert client.get(url).get_data() == first.get_data()
+    assert detail_cache.hits['venue'] == hits + 1
+
+    # as another worker or ``flask import`` writes: no eviction in this process
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(Venue.__table__.update().where(Venue.id == venue_id).values(name='The Green Room'))
+        bump_versions(connection, 'Venue')
+    second = client.get(url)
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert 'The Green Room' in second.get_data(as_text=True)
+    assert client.get(url, headers={'If-None-Match': second.headers['ETag']}).status_code == 304
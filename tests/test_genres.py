@@ -0,0 +1,79 @@
+"""``?genre=`` filters and genre facet counts ( genres.py ) against a count done in Python."""
+from collections import Counter
+
+import pytest
+
+import genres as genres_module
+from benchmarks.catalogue import seed_catalogue
+from cache import LRUCache
+from models import db, Venue, Artist
+
+
+@pytest.fixture(scope='module')
+def tagged(app):
+    """``{kind: [( id, name, genres )]}`` of a freshly seeded catalogue."""
+    with app.app_context():
+        seed_catalogue(db, 60, 120, 0, seed=3)
+        return {kind: [(row.id, row.name, row.genres or []) for row in db.session.query(model.id, model.name, model.genres)]
+                for kind, model in (('venues', Venue), ('artists', Artist))}
+
+
+def expected(rows, genres, term=''):
+    matching = [row for row in rows if all(genre in row[2] for genre in genres) and term.lower() in row[1].lower()]
+    counts = Counter(genre for row in matching for genre in row[2])
+    return {row[0] for row in matching}, counts
+
+
+@pytest.mark.parametrize('kind', ['venues', 'artists'])
+@pytest.mark.parametrize('genres', [[], ['Jazz'], ['Jazz', 'Blues'], ['Unheard Of']])
+def test_list_filter_and_facets(app, tagged, kind, genres):
+    ids, counts = expected(tagged[kind], genres)
+    query = ''.join(f'&genre={genre}' for genre in genres)
+    payload = app.test_client().get(f'/api/v1/{kind}?limit=200&facets=1{query}').get_json()
+    assert {item['id'] for item in payload['data']} == ids
+    facets = {facet['genre']: facet['count'] for facet in payload['facets']}
+    # selected genres stay listed, with a 0 when nothing has them
+    assert facets == {**{genre: 0 for genre in genres}, **counts}
+
+
+@pytest.mark.parametrize('kind', ['venues', 'artists'])
+@pytest.mark.parametrize('term', ['a', 'Blue'])
+def test_search_filter_and_facets(app, tagged, kind, term):
+    ids, counts = expected(tagged[kind], ['Jazz'], term)
+    payload = app.test_client().get(f'/api/v1/{kind}/search?q={term}&genre=Jazz&facets=1').get_json()
+    assert payload['count'] == len(ids)
+    assert {item['id'] for item in payload['data']} <= ids
+    assert {facet['genre']: facet['count'] for facet in payload['facets']} == {'Jazz': 0, **counts}
+
+
+def test_pages_keep_the_genre_filter(app, tagged):
+    ids, counts = expected(tagged['artists'], ['Jazz'])
+    client = app.test_client()
+    response = client.get('/artists?genre=Jazz&limit=2')
+    html = response.get_data(as_text=True)
+    assert 'genre=Jazz' in html.split('class="pager"')[1]
+    assert f'Jazz <span class="badge">{counts["Jazz"]}</span>' in html
+
+
+def test_facets_are_counted_again_after_a_write(app, tagged, monkeypatch):
+    counted = []
+    count_facets = genres_module.count_facets
+
+    def counting(*args, **kwargs):
+        counted.append(args[1])
+        return count_facets(*args, **kwargs)
+
+    monkeypatch.setattr(genres_module, 'count_facets', counting)
+    monkeypatch.setattr(genres_module.genre_facets, 'backend', LRUCache(100))
+    client = app.test_client()
+    url = '/api/v1/artists?genre=Jazz&facets=1&limit=1'
+    first = client.get(url).get_json()['facets']
+    assert client.get(url).get_json()['facets'] == first
+    assert len(counted) == 1
+
+    artist_id = tagged['artists'][0][0]
+    with app.app_context():
+        db.session.get(Artist, artist_id).genres = ['Jazz', 'Polka']
+        db.session.commit()
+    facets = {facet['genre']: facet['count'] for facet in client.get(url).get_json()['facets']}
+    assert len(counted) == 2 and facets['Polka'] == 1
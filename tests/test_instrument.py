@@ -0,0 +1,49 @@
+"""Request timing of streamed pages ( instrument.py ): rows fetched while rendering are database time."""
+import logging
+import re
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from benchmarks.catalogue import seed_catalogue
+from instrument import slow_log
+from models import db
+
+QUERY_DELAY = 0.2
+
+
+class Records(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_streamed_fetches_are_not_render_time(app, monkeypatch):
+    with app.app_context():
+        seed_catalogue(db, 2, 12, 0, seed=4)
+    # log every request, with its timing taken once the body is sent
+    monkeypatch.setitem(app.config, 'SLOW_REQUEST_MS', 0)
+    records = Records()
+    slow_log.addHandler(records)
+
+    def slow_query(*args):
+        time.sleep(QUERY_DELAY)
+
+    event.listen(Engine, 'before_cursor_execute', slow_query)
+    try:
+        response = app.test_client().get('/artists?stream=1&limit=12')
+        response.get_data()
+        response.close()
+    finally:
+        event.remove(Engine, 'before_cursor_execute', slow_query)
+        slow_log.removeHandler(records)
+    logged = dict(re.findall(r'(\w+)=([\d.]+)ms', records.messages[-1]))
+    queries = int(re.search(r'queries=(\d+)', records.messages[-1]).group(1))
+    assert float(logged['db']) >= queries * QUERY_DELAY * 1000
+    # the rows are queried while the template iterates them, which is not render time
+    assert float(logged['render']) < QUERY_DELAY * 1000
@@ -0,0 +1,71 @@
+"""Venue coordinates and the ``/venues/near`` radius search ( geo.py )."""
+import random
+
+import pytest
+
+import geo
+from benchmarks.catalogue import seed_catalogue
+from models import db, Venue
+
+
+@pytest.fixture(scope='module')
+def placed(app):
+    """``[( id, name, latitude, longitude )]`` of a freshly seeded catalogue."""
+    with app.app_context():
+        seed_catalogue(db, 300, 10, 0, seed=5)
+        return db.session.query(Venue.id, Venue.name, Venue.latitude, Venue.longitude).all()
+
+
+def test_cells_cover_the_circle():
+    rng = random.Random(0)
+    for i in range(2000):
+        latitude, longitude = rng.uniform(-70, 70), rng.uniform(-170, 170)
+        radius = rng.uniform(1, 100)
+        south, north, west, east = geo.bounding_box(latitude, longitude, radius)
+        ranges = geo.cell_ranges(south, north, west, east)
+        # a point on the circle, in a random direction
+        point_latitude = latitude + rng.uniform(-1, 1) * radius / geo.MILES_PER_DEGREE
+        point_longitude = longitude + rng.uniform(-1, 1) * (east - longitude)
+        if geo.distance(latitude, longitude, point_latitude, point_longitude) <= radius:
+            assert south <= point_latitude <= north and west <= point_longitude <= east
+            cell = geo.geo_cell(point_latitude, point_longitude)
+            assert any(first <= cell <= last for first, last in ranges)
+
+
+@pytest.mark.parametrize('origin, radius', [
+    ('lat=40.71&lng=-74.01', 25),
+    ('lat=34.05&lng=-118.24', 100),
+    ('city=Saint+Louis&state=MO', 100),
+    ('state=WY', 60),
+])
+def test_matches_brute_force(app, placed, origin, radius):
+    payload = app.test_client().get(f'/api/v1/venues/near?{origin}&radius={radius}').get_json()
+    latitude, longitude = payload['origin']['lat'], payload['origin']['lng']
+    inside = sorted(
+        (geo.distance(latitude, longitude, venue.latitude, venue.longitude), venue.name, venue.id)
+        for venue in placed
+        if venue.latitude is not None
+        and geo.distance(latitude, longitude, venue.latitude, venue.longitude) <= radius)
+    assert payload['count'] == len(inside)
+    assert [venue['id'] for venue in payload['data']] == [id for miles, name, id in inside][:app.config['NEAR_RESULTS_LIMIT']]
+
+
+def test_unknown_place(app, placed):
+    response = app.test_client().get('/api/v1/venues/near?city=Atlantis&state=NY')
+    assert response.status_code == 404
+
+
+def test_venues_are_placed_on_write(app, placed):
+    client = app.test_client()
+    form = {'name': 'Placed Hall', 'city': 'saint louis', 'state': 'MO', 'address': '1 Main St',
+            'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/placed'}
+    client.post('/venues/create', data=form)
+    with app.app_context():
+        venue = db.session.query(Venue).filter(Venue.name == 'Placed Hall').one()
+        assert (venue.latitude, venue.longitude) == (38.63, -90.20)
+        assert venue.geo_cell == geo.geo_cell(38.63, -90.20)
+        venue_id = venue.id
+    client.post(f'/venues/{venue_id}/edit', data=dict(form, city='Springfield'))
+    with app.app_context():
+        venue = db.session.get(Venue, venue_id)
+        assert (venue.latitude, venue.longitude) == (37.21, -93.29)
@@ -0,0 +1,117 @@
+"""Every route stays within the query budget declared on its view ( budget.py ).
+
+Each route is requested on a small and a larger generated catalogue while
+its SQL statements are recorded. A route fails when it issues more
+statements than its budget, or more on the larger catalogue than on the
+small one ( a query per row creeping back in ).
+"""
+import threading
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from benchmarks.catalogue import seed_catalogue
+from benchmarks.routes import cases
+from budget import view_budget
+from models import db, Venue
+from tests.conftest import fyyur_app
+
+# ( venues, artists, shows )
+SIZES = {
+    'small': (20, 40, 400),
+    'large': (100, 200, 2000),
+}
+# endpoints without a view of this app
+UNBUDGETED_ENDPOINTS = ('static', 'assets.hashed_static')
+
+CASES = cases(fyyur_app, writes=True) + [
+    ('GET /api/v1/export/<kind>', 'api.export', 'get', '/api/v1/export/shows?names=1', None),
+    ('GET /api/v1/status', 'api.status', 'get', '/api/v1/status', None),
+    # genre filters and facets
+    ('GET /venues?genre=', 'venues', 'get', '/venues?genre=Jazz&genre=Rock', None),
+    ('GET /artists?genre=&stream=1', 'artists', 'get', '/artists?genre=Jazz&stream=1', None),
+    ('POST /artists/search?genre=', 'search_artists', 'post', '/artists/search?genre=Jazz', {'search_term': 'Blue'}),
+    ('GET /api/v1/venues?genre=&facets=1', 'api.venues', 'get', '/api/v1/venues?genre=Jazz&facets=1', None),
+    ('GET /api/v1/artists/search?genre=&facets=1', 'api.search_artists', 'get',
+     '/api/v1/artists/search?q=Blue&genre=Jazz&facets=1', None),
+    # last: deletes a venue without shows ( added by the fixture ), the path that succeeds
+    ('DELETE /venues/<venue_id>', 'delete_venue', 'delete', '/venues/{empty_venue}', None),
+]
+HEADERS = {'Authorization': 'Bearer test-token'}
+
+
+def record(app, method, url, data):
+    """The statements of one request, the response body included."""
+    statements = []
+    thread = threading.get_ident()
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # not the background work of other threads ( the autocomplete index )
+        if threading.get_ident() == thread:
+            statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', capture)
+    try:
+        response = getattr(app.test_client(), method)(url, data=data, headers=HEADERS)
+        response.get_data()
+        response.close()
+    finally:
+        event.remove(Engine, 'before_cursor_execute', capture)
+    assert response.status_code < 400, (url, response.status_code)
+    return statements
+
+
+@pytest.fixture(scope='module')
+def empty_venues():
+    """``{size: id}`` of the venue without shows added to each catalogue."""
+    return {}
+
+
+@pytest.fixture(scope='module')
+def statements(app, empty_venues):
+    """``{size: {case name: [statements]}}``."""
+    recorded = {}
+    for size, counts in SIZES.items():
+        with app.app_context():
+            seed_catalogue(db, *counts)
+            venue = Venue(name='Empty Hall', city='San Francisco', state='CA')
+            db.session.add(venue)
+            db.session.commit()
+            empty_venues[size] = venue.id
+        recorded[size] = {name: record(app, method, url.format(empty_venue=empty_venues[size]), data)
+                          for name, endpoint, method, url, data in CASES}
+    return recorded
+
+
+def _listing(statements):
+    return '\n'.join(f'  {" ".join(statement.split())[:200]}' for statement in statements)
+
+
+@pytest.mark.parametrize('name, endpoint', [(case[0], case[1]) for case in CASES])
+def test_within_budget(app, statements, name, endpoint):
+    budget = view_budget(app.view_functions[endpoint])
+    for size in SIZES:
+        issued = statements[size][name]
+        assert len(issued) <= budget, \
+            f'{name} issued {len(issued)} statements on the {size} catalogue, its budget is {budget}:\n' \
+            + _listing(issued)
+
+
+@pytest.mark.parametrize('name', [case[0] for case in CASES])
+def test_does_not_grow_with_data(statements, name):
+    small, large = statements['small'][name], statements['large'][name]
+    assert len(large) <= len(small), \
+        f'{name} issued {len(small)} statements on the small catalogue and {len(large)} on the large one:\n' \
+        + _listing(large)
+
+
+def test_delete_venue_deleted(app, statements, empty_venues):
+    with app.app_context():
+        assert db.session.get(Venue, empty_venues['large']) is None
+
+
+def test_every_view_has_a_budget(app):
+    missing = [endpoint for endpoint, view in app.view_functions.items()
+               if endpoint not in UNBUDGETED_ENDPOINTS and view_budget(view) is None]
+    assert not missing, f'views without @query_budget: {", ".join(sorted(missing))}'
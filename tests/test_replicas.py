@@ -0,0 +1,57 @@
+"""Replica health checks off the request path and the read-your-writes cookie ( replicas.py )."""
+import os
+
+from flask import Flask, g
+
+import replicas
+
+
+def replica_app(*urls):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_REPLICA_URIS=list(urls),
+        REPLICA_STICKY_SECONDS=10,
+        REPLICA_MAX_LAG=5,
+        REPLICA_CHECK_INTERVAL=3600,
+        DB_POOL_PRE_PING=True,
+    )
+    replicas.init_app(app)
+    return app
+
+
+def test_replicas_are_used_once_checked(tmp_path):
+    app = replica_app(f'sqlite:///{tmp_path}/replica.db', f'sqlite:///{tmp_path}/missing/replica.db')
+    replica_set = app.extensions['replicas']
+    up, down = replica_set.replicas
+    # no background thread here, checks are run by hand
+    replica_set.pid = os.getpid()
+    # picking never probes on the request path: unchecked replicas are skipped
+    assert replica_set.pick() is None
+    replica_set.check()
+    assert (up.healthy, down.healthy) == (True, False)
+    assert {replica_set.pick() for i in range(4)} == {up.engine}
+
+
+def test_writes_stick_to_the_primary_in_every_worker():
+    app = replica_app('sqlite://')
+    seen = []
+
+    @app.route('/write', methods=['POST'])
+    def write():
+        g.db_wrote = True
+        return ''
+
+    @app.route('/read')
+    def read():
+        seen.append(replicas.wants_replica())
+        return ''
+
+    client = app.test_client()
+    client.get('/read')
+    response = client.post('/write')
+    assert replicas.STICKY_COOKIE in response.headers['Set-Cookie']
+    client.get('/read')
+    # a worker with another SECRET_KEY reads the same unsigned cookie
+    app.secret_key = os.urandom(32)
+    client.get('/read')
+    assert seen == [True, False, False]